@@ -1,6 +1,14 @@
+import logging
+import math
+import numpy as np
 import random
+import time
+
+from array import array
+from collections import deque
 from unittest import skip
 
+logger = logging.getLogger(__name__)
 
 class Minesweeper():
     """
@@ -15,20 +23,22 @@ class Minesweeper():
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = np.zeros((height, width), dtype=bool)
 
         # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        for index in random.sample(range(height * width), mines):
+            i, j = divmod(index, width)
+            self.mines.add((i, j))
+            self.board[i, j] = True
+
+        # Count the mines around every cell at once, by summing the board
+        # shifted in each of the 8 directions (a 3x3 convolution)
+        padded = np.pad(self.board, 1).astype(np.uint8)
+        self.counts = np.zeros((height, width), dtype=np.uint8)
+        for di in range(3):
+            for dj in range(3):
+                if (di, dj) != (1, 1):
+                    self.counts += padded[di:di + height, dj:dj + width]
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -50,7 +60,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i, j])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +68,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return int(self.counts[i, j])
 
     def won(self):
         """
@@ -142,17 +136,660 @@ class Sentence():
         except: 
             None
 
+class KnowledgeBase():
+    """
+    Set of sentences about a Minesweeper game.
+
+    Each sentence is stored as an immutable `(frozenset(cells), count)`
+    key, so duplicates are detected with a single dict lookup. Empty
+    sentences are never stored, and resolved sentences (all of their
+    cells safe, or all mines) are moved to `resolved` instead of being
+    stored, for the AI to turn into safe cells and mines.
+    """
+
+    def __init__(self):
+
+        # Sentences known to be true, and the keys mentioning each cell
+        self.sentences = set()
+        self.index = dict()
+
+        # Resolved sentences waiting to be turned into safes and mines
+        self.resolved = deque()
+
+        # Counters for how the knowledge base has been used
+        self.added = 0
+        self.duplicates = 0
+        self.peak = 0
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def __iter__(self):
+        return iter(self.sentences)
+
+    def __contains__(self, key):
+        return key in self.sentences
+
+    def add(self, cells, count):
+        """
+        Adds the sentence `cells = count`.
+        Returns its key, or None if the sentence was empty, already known
+        or resolved.
+        """
+        cells = frozenset(cells)
+        if not cells:
+            return None
+        key = (cells, count)
+        if key in self.sentences:
+            self.duplicates += 1
+            return None
+        if count == 0 or count == len(cells):
+            self.resolved.append(key)
+            return None
+
+        self.sentences.add(key)
+        for cell in cells:
+            self.index.setdefault(cell, set()).add(key)
+        self.added += 1
+        self.peak = max(self.peak, len(self.sentences))
+        return key
+
+    def remove(self, key):
+        """
+        Removes a sentence and its index entries.
+        """
+        self.sentences.discard(key)
+        for cell in key[0]:
+            keys = self.index.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.index[cell]
+
+    def mark(self, cell, mine):
+        """
+        Removes `cell` from every sentence mentioning it, given whether
+        it is a mine. Returns the keys of the sentences that changed.
+        """
+        changed = []
+        for cells, count in self.index.pop(cell, ()):
+            self.remove((cells, count))
+            key = self.add(cells - {cell}, count - mine)
+            if key is not None:
+                changed.append(key)
+        return changed
+
+    def related(self, key):
+        """
+        Returns the keys of the other sentences sharing a cell with `key`.
+        """
+        related = set()
+        for cell in key[0]:
+            related.update(self.index[cell])
+        related.discard(key)
+        return related
+
+    def stats(self):
+        """
+        Returns a dictionary describing the size of the knowledge base.
+        """
+        return {
+            "sentences": len(self.sentences),
+            "indexed_cells": len(self.index),
+            "peak_sentences": self.peak,
+            "added": self.added,
+            "duplicates": self.duplicates
+        }
+
+
+class GuessEngine():
+    """
+    Estimates the probability that each unknown cell is a mine.
+
+    The frontier (cells mentioned by some sentence) is split into
+    components of cells linked by shared sentences. The consistent mine
+    configurations of each component are counted exactly, by backtracking
+    over its cells and memoizing on the counts still needed by the
+    sentences that are partially assigned. Components that are too large
+    to count, or that are reached once counting has used its share of the
+    time budget, are sampled instead, and once sampling has used its share
+    too, the remaining components are estimated from the mine densities of
+    their sentences. When the total number of mines is known, components
+    and the remaining unconstrained cells are combined by weighting each
+    configuration by the number of ways to place the leftover mines.
+    """
+
+    # Random assignments drawn per component when counting gives up
+    SAMPLES = 200
+
+    # Largest component counted exactly; larger ones are sampled
+    MAX_CELLS = 400
+
+    def __init__(self, sentences, unknown, mines_left=None, time_budget=0.1):
+        """
+        `sentences` are (cells, count) pairs and `unknown` is the number
+        of cells that are neither revealed nor known mines.
+        """
+        self.sentences = list(sentences)
+        self.unknown = unknown
+        self.mines_left = mines_left
+
+        # Exact counting may use the first half of the budget and sampling
+        # the next three tenths, which leaves the rest for combining the
+        # components. Each deadline is shared by all the components
+        start = time.perf_counter()
+        self.count_deadline = start + 0.5 * time_budget
+        self.sample_deadline = start + 0.8 * time_budget
+        self.deadline = start + time_budget
+
+    def probabilities(self):
+        """
+        Returns a dictionary mapping frontier cells to their probability
+        of being a mine, and the probability for every other unknown cell.
+        """
+        components = [
+            self.count(cells, sentences)
+            for cells, sentences in self.components()
+        ]
+        frontier = set()
+        for cells, _ in components:
+            frontier.update(cells)
+        interior = self.unknown - len(frontier)
+
+        if self.mines_left is not None:
+            probs, rest = self.weighted(components, interior)
+            if probs is not None:
+                return probs, rest
+        return self.independent(components)
+
+    def independent(self, components):
+        """
+        Treats every consistent configuration of each component as equally
+        likely, ignoring the total number of mines.
+        """
+        probs = dict()
+        for cells, table in components:
+            total = sum(ways for ways, _ in table.values())
+            for t, cell in enumerate(cells):
+                mines = sum(counts[t] for _, counts in table.values())
+                probs[cell] = mines / total
+
+        # Without a usable mine total, assume the unconstrained cells are
+        # as dangerous as the average frontier cell
+        rest = sum(probs.values()) / len(probs) if probs else 0.5
+        return probs, rest
+
+    def weighted(self, components, interior):
+        """
+        Weights each configuration by the number of ways to place the
+        mines left over in the `interior` unconstrained cells.
+        Returns (None, None) if no configuration fits the mine total, or
+        if the time budget runs out.
+
+        Numbers of ways are kept as floats relative to a reference, with
+        the binomial weights computed in log space, so that the cost does
+        not grow with the size of the board.
+        """
+        # Scale each component's counts by its largest, so that products
+        # of many components stay within floating point range
+        dists = []
+        for _, table in components:
+            top = max(ways for ways, _ in table.values())
+            dists.append({k: ways / top for k, (ways, _) in table.items()})
+
+        def log_weight(k):
+            left = self.mines_left - k
+            if left < 0 or left > interior:
+                return None
+            return (
+                math.lgamma(interior + 1) - math.lgamma(left + 1)
+                - math.lgamma(interior - left + 1)
+            )
+
+        try:
+            # prefix[c] combines the components before c, suffix[c] the
+            # components from c on
+            prefix = [{0: 1.0}]
+            for dist in dists:
+                prefix.append(self.convolve([prefix[-1], dist]))
+            suffix = [{0: 1.0}]
+            for dist in reversed(dists):
+                suffix.append(self.convolve([dist, suffix[-1]]))
+            suffix.reverse()
+            everything = prefix[-1]
+
+            logs = {
+                k: log_weight(k) for k in everything
+                if log_weight(k) is not None
+            }
+            if not logs:
+                return None, None
+            reference = max(logs.values())
+
+            def weight(k):
+                if k not in logs:
+                    value = log_weight(k)
+                    if value is None:
+                        return 0
+                    logs[k] = value
+                return math.exp(logs[k] - reference)
+
+            total = sum(ways * weight(k) for k, ways in everything.items())
+            if total == 0:
+                return None, None
+
+            probs = dict()
+            for c, (cells, table) in enumerate(components):
+                self.check_time()
+                others = self.convolve([prefix[c], suffix[c + 1]])
+                top = max(ways for ways, _ in table.values())
+                for cell in cells:
+                    probs[cell] = 0
+                for k, (_, counts) in table.items():
+                    factor = sum(
+                        share * weight(k + j) for j, share in others.items()
+                    )
+                    for t, cell in enumerate(cells):
+                        probs[cell] += counts[t] / top * factor
+        except TimeoutError:
+            return None, None
+        for cell in probs:
+            probs[cell] /= total
+
+        rest = 0
+        if interior:
+            rest = sum(
+                ways * weight(k) * (self.mines_left - k)
+                for k, ways in everything.items()
+            ) / (total * interior)
+        return probs, rest
+
+    def check_time(self):
+        """
+        Raises TimeoutError once the time budget has run out.
+        """
+        if time.perf_counter() > self.deadline:
+            raise TimeoutError
+
+    def components(self):
+        """
+        Splits the sentences into groups connected by shared cells.
+        Returns a list of (cells, sentences) pairs.
+        """
+        parent = dict()
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        for cells, _ in self.sentences:
+            for cell in cells:
+                parent.setdefault(cell, cell)
+            first = find(next(iter(cells)))
+            for cell in cells:
+                root = find(cell)
+                if root != first:
+                    parent[root] = first
+
+        groups = dict()
+        for sentence in self.sentences:
+            root = find(next(iter(sentence[0])))
+            groups.setdefault(root, []).append(sentence)
+
+        components = []
+        for sentences in groups.values():
+            # Order cells so that sentences close quickly, which keeps the
+            # memoized state small
+            cells = []
+            seen = set()
+            for sentence_cells, _ in sentences:
+                for cell in sorted(sentence_cells):
+                    if cell not in seen:
+                        seen.add(cell)
+                        cells.append(cell)
+            components.append((cells, sentences))
+        return components
+
+    def count(self, cells, sentences):
+        """
+        Counts the mine configurations of a component that satisfy all of
+        its sentences. Returns `cells` and a table mapping each number of
+        mines k to (ways, counts), where counts[t] is the number of those
+        ways in which cells[t] is a mine.
+        """
+        if time.perf_counter() > self.sample_deadline:
+            return cells, self.estimate(cells, sentences)
+
+        position = {cell: t for t, cell in enumerate(cells)}
+        n = len(cells)
+        needs = [count for _, count in sentences]
+        members = [[] for _ in range(n)]
+
+        # How many cells of each sentence are still undecided after cell t,
+        # and which sentences are partially decided before cell t
+        after = [dict() for _ in range(n)]
+        open_at = [[] for _ in range(n + 1)]
+        for s, (sentence_cells, _) in enumerate(sentences):
+            positions = sorted(position[cell] for cell in sentence_cells)
+            for t in positions:
+                members[t].append(s)
+            decided = 0
+            for t in range(positions[0], positions[-1] + 1):
+                while decided < len(positions) and positions[decided] <= t:
+                    decided += 1
+                after[t][s] = len(positions) - decided
+            for t in range(positions[0] + 1, positions[-1] + 1):
+                open_at[t].append(s)
+
+        if n > self.MAX_CELLS:
+            return cells, self.sample(cells, sentences, members, after, needs)
+
+        memo = dict()
+
+        def solve(t):
+            if time.perf_counter() > self.count_deadline:
+                raise TimeoutError
+            if t == n:
+                return {0: (1, [])}
+            key = (t, tuple(needs[s] for s in open_at[t]))
+            if key in memo:
+                return memo[key]
+
+            result = dict()
+            for value in (0, 1):
+                ok = True
+                for s in members[t]:
+                    needs[s] -= value
+                    if needs[s] < 0 or needs[s] > after[t][s]:
+                        ok = False
+                if ok:
+                    for k, (ways, counts) in solve(t + 1).items():
+                        entry = result.setdefault(
+                            k + value, [0, [0] * (n - t)]
+                        )
+                        entry[0] += ways
+                        entry[1][0] += ways * value
+                        for u, c in enumerate(counts):
+                            entry[1][u + 1] += c
+                for s in members[t]:
+                    needs[s] += value
+
+            result = {k: (ways, counts) for k, (ways, counts) in result.items()}
+            memo[key] = result
+            return result
+
+        try:
+            return cells, solve(0)
+        except TimeoutError:
+            needs[:] = [count for _, count in sentences]
+            return cells, self.sample(cells, sentences, members, after, needs)
+
+    def sample(self, cells, sentences, members, after, needs):
+        """
+        Estimates the table from `count` with randomized depth-first
+        searches, for components too large to count or reached after
+        counting has run out of time. Falls back to `estimate` if no
+        assignment is found before the sampling deadline.
+        """
+        n = len(cells)
+        table = dict()
+        assignment = [None] * n
+
+        def search():
+            # Iterative, since components can be much deeper than the
+            # recursion limit; values[t] holds the values still to try
+            left = list(needs)
+            values = [None] * n
+            values[0] = random.sample((0, 1), 2)
+            t = 0
+            while t >= 0:
+                if time.perf_counter() > self.sample_deadline:
+                    raise TimeoutError
+                if t == n:
+                    return True
+                if assignment[t] is not None:
+                    for s in members[t]:
+                        left[s] += assignment[t]
+                    assignment[t] = None
+                if not values[t]:
+                    t -= 1
+                    continue
+                value = values[t].pop()
+                ok = True
+                for s in members[t]:
+                    left[s] -= value
+                    if left[s] < 0 or left[s] > after[t][s]:
+                        ok = False
+                if not ok:
+                    for s in members[t]:
+                        left[s] += value
+                    continue
+                assignment[t] = value
+                t += 1
+                if t < n:
+                    values[t] = random.sample((0, 1), 2)
+            return False
+
+        for _ in range(self.SAMPLES):
+            try:
+                found = search()
+            except TimeoutError:
+                break
+            if not found:
+                break
+            entry = table.setdefault(sum(assignment), [0, [0] * n])
+            entry[0] += 1
+            for t in range(n):
+                entry[1][t] += assignment[t]
+            assignment[:] = [None] * n
+
+        if not table:
+            return self.estimate(cells, sentences)
+        return {k: (ways, counts) for k, (ways, counts) in table.items()}
+
+    def estimate(self, cells, sentences):
+        """
+        Estimates the table from `count` once there is no time left to
+        sample, giving each cell the highest mine density among the
+        sentences that mention it. This is only a rough guide, but it
+        takes time linear in the size of the component.
+        """
+        density = dict()
+        for sentence_cells, count in sentences:
+            for cell in sentence_cells:
+                density[cell] = max(
+                    density.get(cell, 0), count / len(sentence_cells)
+                )
+        scale = 1000
+        counts = [round(density[cell] * scale) for cell in cells]
+        return {round(sum(counts) / scale): (scale, counts)}
+
+    def convolve(self, dists):
+        """
+        Combines distributions over numbers of mines into the distribution
+        of their sum, raising TimeoutError if the time budget runs out.
+        """
+        result = {0: 1}
+        for dist in dists:
+            self.check_time()
+            combined = dict()
+            for a, x in result.items():
+                for b, y in dist.items():
+                    combined[a + b] = combined.get(a + b, 0) + x * y
+            result = combined
+        return result
+
+
+class CellPool():
+    """
+    Set of cells stored as flat indices in a compact array, so that a
+    random cell can be drawn, and any cell removed, in constant time.
+    """
+
+    def __init__(self, height, width):
+        self.width = width
+        self.cells = array("l", range(height * width))
+
+        # Position of each flat index in `cells`, or -1 once removed
+        self.position = array("l", range(height * width))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return self.position[cell[0] * self.width + cell[1]] >= 0
+
+    def __iter__(self):
+        for index in self.cells:
+            yield divmod(index, self.width)
+
+    def remove(self, cell):
+        """
+        Removes `cell` by moving the last cell into its place.
+        """
+        index = cell[0] * self.width + cell[1]
+        position = self.position[index]
+        if position < 0:
+            return
+        last = self.cells.pop()
+        if last != index:
+            self.cells[position] = last
+            self.position[last] = position
+        self.position[index] = -1
+
+    def choice(self):
+        return divmod(random.choice(self.cells), self.width)
+
+
+class LinearSolver():
+    """
+    Draws conclusions from a group of sentences by treating them as a
+    system of linear equations over 0/1 variables, one per cell.
+
+    The system is reduced with Gaussian elimination. Each row keeps its
+    integer coefficients along with a bitmask of its nonzero columns, so
+    finding pivots and skipping rows that do not use a column are single
+    bit operations; the coefficients themselves stay integers because a
+    sentence counts mines rather than their parity. Every reduced row is
+    then checked with bounds reasoning: setting a cell to 0 or 1 must
+    leave the row's right-hand side reachable by the other cells.
+    """
+
+    def __init__(self, sentences):
+        self.columns = sorted(set().union(*(cells for cells, _ in sentences)))
+        column = {cell: c for c, cell in enumerate(self.columns)}
+
+        # Each row is [mask, coefficients, right-hand side]
+        self.rows = []
+        for cells, count in sentences:
+            coefficients = [0] * len(self.columns)
+            mask = 0
+            for cell in cells:
+                coefficients[column[cell]] = 1
+                mask |= 1 << column[cell]
+            self.rows.append([mask, coefficients, count])
+
+    def solve(self):
+        """
+        Returns the sets of cells that are known to be safe and known to
+        be mines.
+        """
+        self.eliminate()
+        safes = set()
+        mines = set()
+        for mask, coefficients, total in self.rows:
+            if not mask:
+                continue
+            low = sum(a for a in coefficients if a < 0)
+            high = sum(a for a in coefficients if a > 0)
+            while mask:
+                bit = mask & -mask
+                c = bit.bit_length() - 1
+                mask ^= bit
+                a = coefficients[c]
+
+                # Range of the right-hand side with this cell fixed to 1,
+                # and with it fixed to 0
+                one = (low + a, high) if a > 0 else (low, high + a)
+                zero = (low, high - a) if a > 0 else (low - a, high)
+                if not one[0] <= total <= one[1]:
+                    safes.add(self.columns[c])
+                elif not zero[0] <= total <= zero[1]:
+                    mines.add(self.columns[c])
+        return safes, mines
+
+    def eliminate(self):
+        """
+        Reduces the rows to reduced row echelon form, scaling each row so
+        that its coefficients have no common factor.
+        """
+        rank = 0
+        for c in range(len(self.columns)):
+            bit = 1 << c
+            pivot = next(
+                (r for r in range(rank, len(self.rows))
+                 if self.rows[r][0] & bit),
+                None
+            )
+            if pivot is None:
+                continue
+            rows = self.rows
+            rows[rank], rows[pivot] = rows[pivot], rows[rank]
+            _, pivot_coefficients, pivot_total = rows[rank]
+            p = pivot_coefficients[c]
+
+            for r in range(len(rows)):
+                if r == rank or not rows[r][0] & bit:
+                    continue
+                _, coefficients, total = rows[r]
+                a = coefficients[c]
+                coefficients = [
+                    x * p - y * a
+                    for x, y in zip(coefficients, pivot_coefficients)
+                ]
+                total = total * p - pivot_total * a
+                divisor = math.gcd(total, *coefficients)
+                if divisor > 1:
+                    coefficients = [x // divisor for x in coefficients]
+                    total //= divisor
+                mask = 0
+                for k, x in enumerate(coefficients):
+                    if x:
+                        mask |= 1 << k
+                rows[r] = [mask, coefficients, total]
+            rank += 1
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    SOLVERS = ("subsets", "linear")
+
+    # Guesses slower than this multiple of `guess_time` are logged as
+    # warnings, since the guess engine should stay within its budget
+    SLOW_GUESS = 3
+
+    def __init__(self, height=8, width=8, mines=None, guess_time=0.1,
+                 solver="subsets"):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines, if known, and seconds allowed per guess
+        self.total_mines = mines
+        self.guess_time = guess_time
+
+        # How to draw conclusions from the knowledge base: by comparing
+        # pairs of sentences, or by solving them as a linear system
+        if solver not in MinesweeperAI.SOLVERS:
+            raise ValueError(f"Unknown solver: {solver}")
+        self.solver = solver
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -160,8 +797,25 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Cells that are neither revealed nor known mines, and safe cells
+        # that may not have been revealed yet
+        self.unknown = CellPool(height, width)
+        self.safe_moves = []
+
+        # Sentences about the game known to be true
+        self.knowledge = KnowledgeBase()
+
+        # Sentences that changed since they were last used for inference
+        self.queue = deque()
+        self.queued = set()
+
+        # Sentences that changed since the last linear solve
+        self.touched = set()
+
+        # Size of the knowledge base after each move, and seconds spent
+        # in each call to add_knowledge and make_random_move
+        self.stats = []
+        self.timings = {"add_knowledge": [], "make_random_move": []}
 
     def mark_mine(self, cell):
         """
@@ -169,8 +823,9 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.unknown.remove(cell)
+        for key in self.knowledge.mark(cell, mine=True):
+            self.enqueue(key)
 
     def mark_safe(self, cell):
         """
@@ -180,9 +835,10 @@ class MinesweeperAI():
         if cell in self.safes:
             return
         self.safes.add(cell)
-        print(str(cell) + " has been marked safe")
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.safe_moves.append(cell)
+        logger.debug("%s has been marked safe", cell)
+        for key in self.knowledge.mark(cell, mine=False):
+            self.enqueue(key)
 
     def add_knowledge(self, cell, count, flags: set):
         """
@@ -199,66 +855,125 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        start = time.perf_counter()
         self.moves_made.add(cell)
+        self.unknown.remove(cell)
         self.mark_safe(cell)
 
         neighboring_cells, count = self.getNeigboringCells(cell, count)
-        num_changes = 0
-        
-        if count == 0:
-            for local_cell in neighboring_cells:
-                num_changes += 1
-                self.mark_safe(local_cell)
-        elif count == len(neighboring_cells):
-            for local_cell in neighboring_cells:
-                num_changes += 1
-                self.mark_mine(local_cell)
-                flags.add(local_cell)
+        self.add_sentence(neighboring_cells, count)
+        if self.solver == "linear":
+            self.infer_linear(flags)
         else:
-            self.knowledge.append(Sentence(neighboring_cells, count))
-        
-        num_changes += self.subsets()
+            self.infer(flags)
 
-        while (num_changes > 0):
-            num_changes = 0
-            num_changes += self.subsets()
-            num_changes += self.checkForZeroCount(flags)
-        
-        print("done in add knowledge")
-
-    def subsets(self):
-        changes = 0
-        newSentences = []
-        for sentence_1 in self.knowledge:
-            for sentence_2 in self.knowledge:
-                if sentence_1 is sentence_2:
-                    None
-                elif sentence_1.cells.issubset(sentence_2.cells):
-                    new_sentence = Sentence(sentence_2.cells.difference(sentence_1.cells), sentence_2.count - sentence_1.count)
-                    if new_sentence not in self.knowledge:
-                        newSentences.append(new_sentence)
-                        changes += 1
-
-        for new_sentence in newSentences:
-            self.knowledge.append(new_sentence)
-        return changes
-
-    def checkForZeroCount(self, flags: set):
-        changes = 0
-        for sentence in self.knowledge:
-            if sentence.count == 0:
-                temp = set(sentence.cells)
-                for cell in temp:
-                    changes += 1
+        stats = self.knowledge.stats()
+        stats["move"] = cell
+        self.stats.append(stats)
+
+        seconds = time.perf_counter() - start
+        self.timings["add_knowledge"].append(seconds)
+        logger.debug(
+            "Added knowledge for %s in %.3fms (%d sentences)",
+            cell, seconds * 1000, stats["sentences"]
+        )
+
+    def add_sentence(self, cells, count):
+        """
+        Adds the sentence `cells = count` to the knowledge base and queues
+        it for inference.
+        """
+        key = self.knowledge.add(cells, count)
+        if key is not None:
+            self.enqueue(key)
+
+    def enqueue(self, key):
+        if self.solver == "linear":
+            self.touched.add(key)
+        if key not in self.queued:
+            self.queued.add(key)
+            self.queue.append(key)
+
+    def infer(self, flags: set):
+        """
+        Draws conclusions from the knowledge base until nothing changes.
+
+        Resolved sentences are turned into safe cells and mines first.
+        Each queued sentence is then compared with the sentences sharing
+        a cell with it to infer subset differences; only sentences that
+        share a cell can be subsets of each other, so the cell index keeps
+        each step local to the queued sentence.
+        """
+        while self.knowledge.resolved or self.queue:
+            if self.knowledge.resolved:
+                self.resolve(flags)
+                continue
+
+            key = self.queue.popleft()
+            self.queued.discard(key)
+            if key not in self.knowledge:
+                continue
+
+            cells, count = key
+            for other_cells, other_count in self.knowledge.related(key):
+                if cells < other_cells:
+                    self.add_sentence(
+                        other_cells - cells, other_count - count
+                    )
+                elif other_cells < cells:
+                    self.add_sentence(
+                        cells - other_cells, count - other_count
+                    )
+
+    def infer_linear(self, flags: set):
+        """
+        Draws conclusions from the knowledge base until nothing changes,
+        by also solving the sentences around each change as a linear
+        system.
+
+        The cheap subset rule runs first, since which combinations of
+        sentences end up as reduced rows depends on the pivot order and
+        elimination alone can miss some of its conclusions. Only the
+        sentences connected (through shared cells) to a sentence that
+        changed since the last round are solved, since no other sentence
+        can lead to a new conclusion.
+        """
+        while True:
+            self.infer(flags)
+
+            component = set()
+            pending = [key for key in self.touched if key in self.knowledge]
+            self.touched.clear()
+            while pending:
+                key = pending.pop()
+                if key not in component:
+                    component.add(key)
+                    pending.extend(self.knowledge.related(key) - component)
+            if not component:
+                return
+
+            safes, mines = LinearSolver(component).solve()
+            if not safes and not mines:
+                return
+            for cell in mines:
+                self.mark_mine(cell)
+                flags.add(cell)
+            for cell in safes:
+                self.mark_safe(cell)
+
+    def resolve(self, flags: set):
+        """
+        Marks the cells of every resolved sentence as safes or mines.
+        """
+        resolved = self.knowledge.resolved
+        while resolved:
+            cells, count = resolved.popleft()
+            for cell in cells:
+                if count == 0:
                     self.mark_safe(cell)
-            elif sentence.count == len(sentence.cells):
-                temp = set(sentence.cells)
-                for cell in temp:
-                    changes += 1
+                elif cell not in self.mines:
                     self.mark_mine(cell)
                     flags.add(cell)
-        return changes
-    
 
     def getNeigboringCells(self, cell, count):
         neighboring_cells = set()
@@ -266,8 +981,8 @@ class MinesweeperAI():
         
         for direction in directions:
             neighbor_x, neighbor_y = cell[0] + direction[0], cell[1] + direction[1]
-            if (neighbor_x >= 0 and neighbor_x < self.width and neighbor_y >= 0 
-                and neighbor_y < self.height and (neighbor_x, neighbor_y) not in self.mines 
+            if (neighbor_x >= 0 and neighbor_x < self.height and neighbor_y >= 0 
+                and neighbor_y < self.width and (neighbor_x, neighbor_y) not in self.mines 
                 and (neighbor_x, neighbor_y) not in self.safes):
                 neighboring_cells.add((neighbor_x, neighbor_y))
             if (neighbor_x, neighbor_y) in self.mines:
@@ -285,12 +1000,14 @@ class MinesweeperAI():
         and self.moves_made, but should not modify any of those values.
         """
 
-        for safe in self.safes:
+        # Safe cells are only queued once, so drop those already revealed
+        while self.safe_moves:
+            safe = self.safe_moves[-1]
             if safe not in self.moves_made and safe not in self.mines:
                 return safe
-        
+            self.safe_moves.pop()
+
         return None
-        
 
     def make_random_move(self):
         """
@@ -298,13 +1015,54 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        Among those cells, the ones least likely to be a mine according
+        to the knowledge base are preferred; ties are broken randomly.
         """
-        safes = []
-        for x in range(self.width):
-            for y in range(self.height):
-                if (x, y) not in self.moves_made and (x,y) not in self.mines:
-                    safes.append((x,y))
-        
-        randNum = random.randint(0, len(safes))
+        if not self.unknown:
+            return None
 
-        return None if len(safes) == 0 else safes[randNum]
+        start = time.perf_counter()
+        mines_left = None
+        if self.total_mines is not None:
+            mines_left = self.total_mines - len(self.mines)
+        engine = GuessEngine(
+            self.knowledge, len(self.unknown), mines_left, self.guess_time
+        )
+        probs, rest = engine.probabilities()
+
+        unconstrained = len(probs) < len(self.unknown)
+        best = min(probs.values(), default=rest)
+        if unconstrained:
+            best = min(best, rest)
+        choices = [cell for cell in probs if probs[cell] == best]
+        if unconstrained and rest == best:
+            choices.append(self.random_unconstrained(probs))
+        move = random.choice(choices)
+
+        seconds = time.perf_counter() - start
+        self.timings["make_random_move"].append(seconds)
+        logger.debug(
+            "Guessed %s with mine probability %.3f in %.3fms",
+            move, best, seconds * 1000
+        )
+        if seconds > self.SLOW_GUESS * self.guess_time:
+            logger.warning(
+                "Guess took %.3fms, over %d times the %.3fms budget",
+                seconds * 1000, self.SLOW_GUESS, self.guess_time * 1000
+            )
+        return move
+
+    def random_unconstrained(self, frontier):
+        """
+        Returns a random unknown cell that is not in `frontier`.
+        """
+        # The frontier is usually a small part of the unknown cells, so
+        # a few random draws find an unconstrained cell without a scan
+        for _ in range(32):
+            cell = self.unknown.choice()
+            if cell not in frontier:
+                return cell
+        return random.choice(
+            [cell for cell in self.unknown if cell not in frontier]
+        )
@@ -1,13 +1,21 @@
+import logging
 import pygame
 import sys
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+
 from minesweeper import Minesweeper, MinesweeperAI
 
 HEIGHT = 8
 WIDTH = 8
 MINES = 8
 
+# Show the runner's messages; set the level to DEBUG to also see every
+# conclusion the AI draws and how long each move takes
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("runner")
+
 # Colors
 BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
@@ -39,13 +47,47 @@ mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
 flags = set()
 lost = False
 
+# The AI works on a background thread so the window stays responsive:
+# `thinking` is the AI's pending move, and `updates` are pending calls to
+# add_knowledge, in order. The main loop polls both every frame.
+worker = ThreadPoolExecutor(max_workers=1)
+thinking = None
+updates = []
+
+
+def ai_move(ai):
+    """
+    Choose the AI's next move. Returns the move, and if there is none
+    left, the cells the AI knows to be mines.
+    """
+    move = ai.make_safe_move()
+    if move is None:
+        move = ai.make_random_move()
+        if move is None:
+            logger.info("No moves left to make.")
+            return None, ai.mines.copy()
+        logger.info("No known safe moves, AI making random move.")
+    else:
+        logger.info("AI making safe move.")
+    return move, None
+
+
+def ai_update(ai, move, nearby):
+    """
+    Tell the AI about a revealed cell. Returns the mines it found.
+    """
+    found = set()
+    ai.add_knowledge(move, nearby, found)
+    return found
+
+
 # Show instructions initially
 instructions = True
 
@@ -154,6 +196,8 @@ while True:
 
     # Display text
     text = "Lost" if lost else "Won" if game.mines == flags else ""
+    if not text and (thinking is not None or updates):
+        text = "Thinking..."
     text = mediumFont.render(text, True, WHITE)
     textRect = text.get_rect()
     textRect.center = ((5 / 6) * width, (2 / 3) * height)
@@ -178,27 +222,21 @@ while True:
     elif left == 1:
         mouse = pygame.mouse.get_pos()
 
-        # If AI button clicked, make an AI move
+        # If AI button clicked, ask the AI for a move
         if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
-                else:
-                    print("No known safe moves, AI making random move.")
-            else:
-                print("AI making safe move.")
+            if thinking is None:
+                thinking = worker.submit(ai_move, ai)
             time.sleep(0.2)
 
         # Reset game state
         elif resetButton.collidepoint(mouse):
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
             revealed = set()
             flags = set()
             lost = False
+            thinking = None
+            updates = []
             continue
 
         # User-made move
@@ -210,13 +248,26 @@ while True:
                             and (i, j) not in revealed):
                         move = (i, j)
 
-    # Make move and update AI knowledge
+    # Collect the AI's move once it has been chosen
+    if thinking is not None and thinking.done():
+        ai_choice, mines = thinking.result()
+        thinking = None
+        if ai_choice is None:
+            flags = mines
+        elif not lost and ai_choice not in revealed:
+            move = ai_choice
+
+    # Make move and update AI knowledge in the background
     if move:
         if game.is_mine(move):
             lost = True
         else:
             nearby = game.nearby_mines(move)
             revealed.add(move)
-            ai.add_knowledge(move, nearby, flags)
+            updates.append(worker.submit(ai_update, ai, move, nearby))
+
+    # Flag the mines the AI has found so far
+    while updates and updates[0].done():
+        flags |= updates.pop(0).result()
 
     pygame.display.flip()
@@ -0,0 +1,158 @@
+import argparse
+import logging
+import os
+import random
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Minesweeper games with the AI, without a display."
+    )
+    parser.add_argument("-n", "--games", type=int, default=100)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=None,
+                        help="number of mines (overrides --density)")
+    parser.add_argument("--density", type=float, default=0.125,
+                        help="fraction of cells that are mines")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game; game k uses seed + k")
+    parser.add_argument("--solver", choices=MinesweeperAI.SOLVERS,
+                        default="subsets",
+                        help="how the AI draws conclusions from its knowledge")
+    parser.add_argument("--parallel", type=int, nargs="?", const=0,
+                        default=None, metavar="WORKERS",
+                        help="play games in worker processes "
+                             "(default: one per core)")
+    parser.add_argument("--log-level", default="WARNING",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="log messages from the AI at this level")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(message)s")
+
+    mines = args.mines
+    if mines is None:
+        mines = round(args.height * args.width * args.density)
+
+    start = time.perf_counter()
+    results = simulate(
+        args.games, args.height, args.width, mines,
+        seed=args.seed, solver=args.solver, workers=args.parallel
+    )
+    elapsed = time.perf_counter() - start
+
+    report = summarize(results)
+    print(f"{args.games} games on {args.height}x{args.width} "
+          f"with {mines} mines using the {args.solver} solver "
+          f"in {elapsed:.2f}s")
+    print(f"  Win rate: {report['win_rate']:.1%}")
+    print(f"  Moves per second: {report['moves'] / elapsed:.1f}")
+    print(f"  Inference time per move: "
+          f"{report['inference_per_move'] * 1000:.3f}ms")
+    print(f"  Guessing time per move: "
+          f"{report['guessing_per_move'] * 1000:.3f}ms")
+    print(f"  Slowest guess: {report['slowest_guess'] * 1000:.3f}ms "
+          f"({report['slow_guesses']} over "
+          f"{MinesweeperAI.SLOW_GUESS} times the budget)")
+    print(f"  Knowledge base size: {report['mean_sentences']:.1f} "
+          f"sentences on average, {report['peak_sentences']} at peak")
+
+
+def simulate(games, height, width, mines, seed=0, solver="subsets",
+             workers=None):
+    """
+    Play `games` games and return a list with the result of each one.
+    Game k is played with random seed `seed + k`, so results do not depend
+    on how games are spread across processes. If `workers` is not None,
+    games are played in that many processes (0 means one per core).
+    """
+    seeds = range(seed, seed + games)
+    if workers is None:
+        return [play(height, width, mines, s, solver) for s in seeds]
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(
+            play,
+            [height] * games, [width] * games, [mines] * games, seeds,
+            [solver] * games,
+            chunksize=max(1, games // (4 * (workers or os.cpu_count())))
+        ))
+
+
+def play(height, width, mines, seed, solver="subsets"):
+    """
+    Play one game with the AI and return a dictionary describing it.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(
+        height=height, width=width, mines=mines, solver=solver
+    )
+
+    flags = set()
+    won = False
+    while True:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None or game.is_mine(move):
+            break
+
+        ai.add_knowledge(move, game.nearby_mines(move), flags)
+
+        if len(ai.moves_made) == height * width - mines:
+            won = True
+            break
+
+    return {
+        "seed": seed,
+        "won": won,
+        "moves": len(ai.moves_made),
+        "inference": sum(ai.timings["add_knowledge"]),
+        "guessing": sum(ai.timings["make_random_move"]),
+        "slowest_guess": max(ai.timings["make_random_move"], default=0),
+        "slow_guesses": sum(
+            seconds > ai.SLOW_GUESS * ai.guess_time
+            for seconds in ai.timings["make_random_move"]
+        ),
+        "sentences": [stats["sentences"] for stats in ai.stats],
+        "peak_sentences": ai.knowledge.peak
+    }
+
+
+def summarize(results):
+    """
+    Combine the results of several games into overall statistics.
+    """
+    moves = sum(result["moves"] for result in results)
+    sizes = [size for result in results for size in result["sentences"]]
+    return {
+        "games": len(results),
+        "win_rate": sum(result["won"] for result in results) / len(results),
+        "moves": moves,
+        "inference_per_move": (
+            sum(result["inference"] for result in results) / moves
+            if moves else 0
+        ),
+        "guessing_per_move": (
+            sum(result["guessing"] for result in results) / moves
+            if moves else 0
+        ),
+        "slowest_guess": max(
+            result["slowest_guess"] for result in results
+        ),
+        "slow_guesses": sum(result["slow_guesses"] for result in results),
+        "mean_sentences": sum(sizes) / len(sizes) if sizes else 0,
+        "peak_sentences": max(
+            result["peak_sentences"] for result in results
+        )
+    }
+
+
+if __name__ == "__main__":
+    main()
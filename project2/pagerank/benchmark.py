@@ -0,0 +1,343 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import pagerank
+
+DAMPING = 0.85
+
+# Each method, and the largest number of pages it is run on by default.
+# Methods that work on Python lists of links become too slow or too
+# large in memory well before the NumPy-based ones do
+METHODS = {
+    "crawl": 10 ** 5,
+    "crawl_parallel": 10 ** 5,
+    "cached_crawl": 10 ** 5,
+    "cached_crawl_warm": 10 ** 5,
+    "sample": 10 ** 5,
+    "iterate": 10 ** 5,
+    "gauss-seidel": 10 ** 5,
+    "matrix": 10 ** 6,
+    "walker": 10 ** 6,
+    "mmap": 10 ** 7
+}
+CRAWLERS = ("crawl", "crawl_parallel", "cached_crawl", "cached_crawl_warm")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the PageRank functions on synthetic corpora."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10 ** 3, 10 ** 4],
+                        help="numbers of pages to generate")
+    parser.add_argument("--degree", type=float, default=8,
+                        help="average number of links per page")
+    parser.add_argument("--out-exponent", type=float, default=2.7,
+                        help="power-law exponent of the links per page")
+    parser.add_argument("--in-exponent", type=float, default=2.1,
+                        help="power-law exponent of the links to a page")
+    parser.add_argument("--dangling", type=float, default=0.05,
+                        help="fraction of pages without links")
+    parser.add_argument("--samples", type=int, default=10 ** 5,
+                        help="pages to sample in the sampling methods")
+    parser.add_argument("--methods", nargs="+", choices=list(METHODS),
+                        default=list(METHODS))
+    parser.add_argument("--no-limits", action="store_true",
+                        help="run every method on every size")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the second, traced run of each method "
+                             "that measures its peak memory")
+    parser.add_argument("--corpus-dir", default=None,
+                        help="write the HTML corpora here instead of to a "
+                             "temporary directory, and keep them")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json",
+                        help="file to write the results to")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        result = benchmark(size, args)
+        results.append(result)
+        print(f"{result['pages']} pages, {result['links']} links "
+              f"(generated in {result['generate_seconds']:.2f}s)")
+        for name, timing in result["methods"].items():
+            if "skipped" in timing:
+                print(f"  {name}: skipped, {timing['skipped']}")
+                continue
+            line = f"  {name}: {timing['seconds']:.3f}s"
+            if timing.get("peak_memory_mb") is not None:
+                line += f", {timing['peak_memory_mb']:.1f}MB"
+            if timing.get("l1_error") is not None:
+                line += f", L1 error {timing['l1_error']:.2e}"
+            print(line)
+
+    with open(args.output, "w") as f:
+        json.dump({"settings": vars(args), "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def benchmark(size, args):
+    """
+    Generate a corpus of `size` pages and time each method in
+    `args.methods` on it. Return a dictionary describing the corpus and
+    the time, peak memory and error of each method.
+    """
+    start = time.perf_counter()
+    offsets, links = power_law_graph(
+        size, args.degree, args.out_exponent, args.in_exponent,
+        args.dangling, seed=args.seed
+    )
+    result = {
+        "pages": size,
+        "links": len(links),
+        "generate_seconds": time.perf_counter() - start,
+        "max_out_degree": int(np.diff(offsets).max(initial=0)),
+        "max_in_degree": int(np.bincount(links, minlength=size).max()),
+        "dangling": int((np.diff(offsets) == 0).sum()),
+        "methods": dict()
+    }
+
+    wanted = [
+        name for name in args.methods
+        if args.no_limits or size <= METHODS[name]
+    ]
+    for name in args.methods:
+        if name not in wanted:
+            result["methods"][name] = {
+                "skipped": f"more than {METHODS[name]} pages"
+            }
+    if not wanted:
+        return result
+
+    # Only the out-of-core method can run without the whole corpus in
+    # memory, and it has no reference to compare against without it
+    graph = reference = None
+    if any(name != "mmap" for name in wanted):
+        corpus = link_corpus(offsets, links)
+        graph = pagerank.LinkGraph(corpus)
+        reference = pagerank.matrix_pagerank(
+            graph, DAMPING, tolerance=1e-12
+        )
+
+    scratch = args.corpus_dir or tempfile.mkdtemp()
+    directory = None
+    if any(name in CRAWLERS for name in wanted):
+        directory = os.path.join(scratch, f"corpus-{size}")
+        write_corpus(directory, offsets, links)
+    edges = None
+    if "mmap" in wanted:
+        edges = os.path.join(scratch, f"links-{size}.bin")
+        start = time.perf_counter()
+        pagerank.write_edges(edges, offsets, links)
+        result["export_seconds"] = time.perf_counter() - start
+
+    runs = {
+        "crawl": lambda: pagerank.crawl(directory),
+        "crawl_parallel": lambda: pagerank.crawl_parallel(directory)[0],
+        "cached_crawl": lambda: pagerank.cached_crawl(directory),
+        "cached_crawl_warm": lambda: pagerank.cached_crawl(directory),
+        "sample": lambda: pagerank.sample_pagerank(
+            graph, DAMPING, args.samples
+        ),
+        "iterate": lambda: pagerank.iterate_pagerank(graph, DAMPING),
+        "gauss-seidel": lambda: pagerank.solve_pagerank(
+            graph, DAMPING, method="gauss-seidel"
+        ).ranks,
+        "matrix": lambda: pagerank.matrix_pagerank(graph, DAMPING),
+        "walker": lambda: pagerank.walker_pagerank(
+            graph, DAMPING, args.samples, seed=args.seed
+        )[0],
+        "mmap": lambda: pagerank.mmap_pagerank(edges, DAMPING)
+    }
+    # cached_crawl is timed from an empty cache, and cached_crawl_warm
+    # from a cache that is already up to date, on every call
+    cache = None if directory is None else os.path.join(
+        directory, ".pagerank-cache.json"
+    )
+    setups = {
+        "cached_crawl": lambda: remove_file(cache),
+        "cached_crawl_warm": lambda: (
+            os.path.exists(cache) or pagerank.cached_crawl(directory)
+        )
+    }
+    for name in wanted:
+        value, seconds, peak = measure(
+            runs[name], not args.no_memory, setups.get(name)
+        )
+        timing = {"seconds": seconds, "peak_memory_mb": peak}
+        if name in CRAWLERS:
+            timing["correct"] = value == corpus
+        elif reference is not None:
+            if name == "mmap":
+                value = graph.ranks(value.tolist())
+            timing.update(errors(value, reference))
+        result["methods"][name] = timing
+
+    if args.corpus_dir is None:
+        if directory is not None:
+            remove_corpus(directory)
+        if edges is not None:
+            os.remove(edges)
+            os.remove(edges + ".ranks")
+        os.rmdir(scratch)
+    return result
+
+
+def power_law_graph(n, degree=8, out_exponent=2.7, in_exponent=2.1,
+                    dangling=0.05, seed=0):
+    """
+    Return a random link graph on `n` pages as NumPy CSR arrays
+    `(offsets, links)`, where page i links to
+    links[offsets[i]:offsets[i + 1]], sorted.
+
+    The number of links on each page follows a power law with exponent
+    `out_exponent`, scaled so that pages have `degree` links on average,
+    and a `dangling` fraction of pages have none. Each link points to a
+    page chosen with probability proportional to a power-law weight with
+    exponent `in_exponent`, so the links to each page follow that power
+    law too. Self-links and repeated links are dropped.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Pareto weights with density exponent a have tail exponent a - 1
+    weights = rng.pareto(out_exponent - 1, n) + 1
+    degrees = np.rint(weights * degree / weights.mean()).astype(np.int64)
+    degrees = np.clip(degrees, 1, max(n - 1, 1))
+    degrees[rng.random(n) < dangling] = 0
+
+    popularity = np.cumsum(rng.pareto(in_exponent - 1, n) + 1)
+    sources = np.repeat(np.arange(n, dtype=np.int64), degrees)
+
+    # Looking up sorted draws walks the table in order, which is much
+    # faster than random lookups; shuffling afterwards pairs the targets
+    # with sources at random again
+    draws = rng.random(len(sources)) * popularity[-1]
+    draws.sort()
+    targets = np.searchsorted(popularity, draws, side="right")
+    rng.shuffle(targets)
+    np.minimum(targets, n - 1, out=targets)
+
+    # Sorting the (source, target) pairs as single numbers also groups
+    # the links by source page
+    keys = sources * n + targets
+    keys = keys[sources != targets]
+    keys.sort()
+    keys = keys[np.append(True, keys[1:] != keys[:-1])]
+    sources, links = np.divmod(keys, n)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+    return offsets, links
+
+
+def page_names(n):
+    """
+    Return the file names of `n` synthetic pages, padded so that they
+    sort in page order.
+    """
+    width = len(str(max(n - 1, 0)))
+    return [f"{i:0{width}}.html" for i in range(n)]
+
+
+def link_corpus(offsets, links):
+    """
+    Return the graph `(offsets, links)` as a corpus dictionary mapping
+    each page name to the set of page names it links to.
+    """
+    names = page_names(len(offsets) - 1)
+    links = links.tolist()
+    return {
+        name: set(names[j] for j in links[offsets[i]:offsets[i + 1]])
+        for i, name in enumerate(names)
+    }
+
+
+def write_corpus(directory, offsets, links):
+    """
+    Write the graph `(offsets, links)` to `directory` as one HTML file
+    per page, in the style of the example corpora.
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = page_names(len(offsets) - 1)
+    links = links.tolist()
+    for i, name in enumerate(names):
+        items = "".join(
+            f"            <li><a href=\"{names[j]}\">{names[j]}</a></li>\n"
+            for j in links[offsets[i]:offsets[i + 1]]
+        )
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(
+                "<!DOCTYPE html>\n"
+                "<html lang=\"en\">\n"
+                f"    <head>\n        <title>{i}</title>\n    </head>\n"
+                f"    <body>\n        <h1>{i}</h1>\n\n"
+                "        <div>Links:</div>\n"
+                f"        <ul>\n{items}        </ul>\n"
+                "    </body>\n"
+                "</html>\n"
+            )
+
+
+def remove_corpus(directory):
+    """
+    Delete a corpus written by `write_corpus`, along with any crawl cache.
+    """
+    for entry in os.scandir(directory):
+        os.remove(entry.path)
+    os.rmdir(directory)
+
+
+def remove_file(path):
+    """
+    Delete the file at `path` if there is one.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def measure(run, memory=True, setup=None):
+    """
+    Call `run` and return its result, the seconds it took and its peak
+    memory in megabytes. The memory is measured with tracemalloc in a
+    second call, so that tracing does not slow the timed one; it is None
+    if `memory` is false. Memory-mapped files are not counted. If given,
+    `setup` is called untimed before each call, so that both calls start
+    from the same state.
+    """
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    value = run()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1] / (1 << 20)
+        tracemalloc.stop()
+    return value, seconds, peak
+
+
+def errors(ranks, reference):
+    """
+    Return the L1 and largest absolute differences between the PageRank
+    values in `ranks` and in `reference`.
+    """
+    differences = [abs(ranks[page] - reference[page]) for page in reference]
+    return {
+        "l1_error": sum(differences),
+        "max_error": max(differences, default=0)
+    }
+
+
+if __name__ == "__main__":
+    main()
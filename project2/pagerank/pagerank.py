@@ -1,12 +1,20 @@
+import json
 import os
+import posixpath
 import random
 import re
 import sys
 import math
+import time
+
+from collections import deque
+from urllib.parse import unquote
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
 
 def main():
     if len(sys.argv) != 2:
@@ -36,7 +44,7 @@ def crawl(directory):
             continue
         with open(os.path.join(directory, filename)) as f:
             contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
+            links = LINK.findall(contents)
             pages[filename] = set(links) - {filename}
 
     # Only include links to other pages in the corpus
@@ -46,7 +54,338 @@ def crawl(directory):
             if link in pages
         )
 
-    return pages
+    return LinkGraph(pages)
+
+
+def crawl_parallel(directory, processes=None, chunk_size=1 << 16):
+    """
+    Parse a directory of HTML pages like `crawl`, for very large corpora.
+
+    Files are read in chunks of `chunk_size` characters rather than all at
+    once, and parsed by a pool of `processes` worker processes (one per
+    core by default). Link targets are normalized (fragments and queries
+    dropped, percent-escapes decoded, "./" and ".." resolved) before being
+    matched against the corpus. Pages are numbered as their results
+    arrive, so the link graph is built up as integer lists.
+
+    Return a pair: the LinkGraph, and a dictionary of statistics with the
+    number of files, seconds taken, files per second, the peak memory of
+    this process and the peak memory of the largest worker process, in
+    megabytes (None where unknown).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    start = time.perf_counter()
+    filenames = [
+        entry.name for entry in os.scandir(directory)
+        if entry.name.endswith(".html") and entry.is_file()
+    ]
+    paths = [os.path.join(directory, filename) for filename in filenames]
+
+    # Number every page as it is first seen, whether as a file or a target
+    index = dict()
+    names = []
+    forward = dict()
+
+    def number(page):
+        if page not in index:
+            index[page] = len(names)
+            names.append(page)
+        return index[page]
+
+    workers = processes or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            extract_links, paths, [chunk_size] * len(paths),
+            chunksize=max(1, len(paths) // (workers * 16))
+        )
+        for filename, links in zip(filenames, results):
+            page = number(filename)
+            forward[page] = [
+                number(link) for link in links if link != filename
+            ]
+
+    # Only include links to other pages in the corpus, renumbering the
+    # files from 0 and dropping every other target
+    files = list(forward)
+    renumber = {page: i for i, page in enumerate(files)}
+    graph = LinkGraph.from_links(
+        [names[page] for page in files],
+        [
+            [renumber[j] for j in forward[page] if j in renumber]
+            for page in files
+        ]
+    )
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "files": len(filenames),
+        "seconds": seconds,
+        "files_per_second": len(filenames) / seconds if seconds else 0,
+        "peak_memory_mb": peak_memory(),
+        "peak_worker_memory_mb": peak_memory(children=True)
+    }
+    return graph, stats
+
+
+def cached_crawl(directory, cache_file=None):
+    """
+    Parse a directory of HTML pages like `crawl`, reusing the results of
+    earlier runs. Files are parsed one after another in this process,
+    with the same link normalization as `crawl_parallel`.
+
+    The links extracted from each file are saved in `cache_file` (by
+    default ".pagerank-cache.json" inside `directory`), keyed by file name
+    along with its modification time and size, so only new or changed
+    files are parsed again. The cache also holds the finished link graph:
+    when no file has changed, the graph is loaded from it without opening
+    any HTML file. If the cache cannot be written, for example because
+    the corpus is read-only, the graph is returned without saving it.
+
+    Return the LinkGraph.
+    """
+    if cache_file is None:
+        cache_file = os.path.join(directory, ".pagerank-cache.json")
+
+    files = dict()
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".html") and entry.is_file():
+            info = entry.stat()
+            files[entry.name] = [info.st_mtime_ns, info.st_size]
+
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = dict()
+    if cache.get("version") != 1:
+        cache = {"version": 1, "files": dict(), "graph": None}
+
+    cached = cache["files"]
+    unchanged = all(
+        name in cached and cached[name][:2] == signature
+        for name, signature in files.items()
+    )
+    if unchanged and len(cached) == len(files) and cache["graph"]:
+        return LinkGraph.load(cache["graph"])
+
+    pages = dict()
+    for name, signature in files.items():
+        if name in cached and cached[name][:2] == signature:
+            links = cached[name][2]
+        else:
+            links = sorted(extract_links(os.path.join(directory, name)))
+        cached[name] = signature + [links]
+        pages[name] = set(links) - {name}
+    for name in set(cached) - set(files):
+        del cached[name]
+
+    # Only include links to other pages in the corpus
+    for name in pages:
+        pages[name] = set(link for link in pages[name] if link in pages)
+    graph = LinkGraph(pages)
+    cache["graph"] = graph.dump()
+
+    # Write to a temporary file first, so an interrupted run never leaves
+    # a truncated cache behind
+    temporary = cache_file + ".tmp"
+    try:
+        with open(temporary, "w") as f:
+            json.dump(cache, f, separators=(",", ":"))
+        os.replace(temporary, cache_file)
+    except OSError:
+        pass
+    return graph
+
+
+def extract_links(path, chunk_size=1 << 16):
+    """
+    Return the set of normalized link targets in the HTML file `path`,
+    reading it `chunk_size` characters at a time.
+    """
+    links = set()
+    tail = ""
+    with open(path, errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            text = tail + chunk
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(normalize_link(match.group(1)))
+                end = match.end()
+
+            # Keep any tag that may continue into the next chunk
+            last = text.rfind("<", end)
+            tail = text[last:] if last >= 0 else ""
+    links.discard("")
+    return links
+
+
+def normalize_link(link):
+    """
+    Return `link` without any fragment or query, with percent-escapes
+    decoded and "." and ".." path segments resolved.
+    """
+    link = link.split("#", 1)[0].split("?", 1)[0].strip()
+    if not link:
+        return ""
+    return posixpath.normpath(unquote(link))
+
+
+def peak_memory(children=False):
+    """
+    Return the peak resident memory of this process in megabytes, or with
+    `children`, the largest peak of any of its finished child processes.
+    Return None if it cannot be measured here.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+
+
+class LinkGraph(dict):
+    """
+    Link structure of a corpus.
+
+    A LinkGraph is the dictionary `crawl` has always returned (each page
+    mapped to the set of pages it links to), and also holds the links as
+    integer-indexed arrays that the PageRank algorithms work on:
+
+        pages       page names, sorted; page i is pages[i]
+        index       page name -> page number
+        forward     forward[i] lists the pages that page i links to
+        reverse     reverse[i] lists the pages that link to page i
+        out_degree  out_degree[i] is the number of links on page i
+        dangling    pages with no links at all
+
+    The arrays are computed once, so the dictionary should not be changed
+    afterwards.
+    """
+
+    def __init__(self, corpus):
+        super().__init__(corpus)
+        self.pages = sorted(corpus)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+
+        self.forward = [
+            sorted(self.index[link] for link in corpus[page])
+            for page in self.pages
+        ]
+        self.link_arrays()
+
+    @classmethod
+    def from_links(cls, names, forward):
+        """
+        Return the graph in which page number i is named names[i] and
+        links to the pages numbered in forward[i], working on the page
+        numbers rather than looking up every link by name.
+        """
+        order = sorted(range(len(names)), key=names.__getitem__)
+        number = [0] * len(names)
+        for i, old in enumerate(order):
+            number[old] = i
+
+        graph = cls.__new__(cls)
+        graph.pages = [names[old] for old in order]
+        graph.index = {page: i for i, page in enumerate(graph.pages)}
+        graph.forward = [
+            sorted(number[j] for j in forward[old]) for old in order
+        ]
+        for page, links in zip(graph.pages, graph.forward):
+            dict.__setitem__(
+                graph, page, set(graph.pages[j] for j in links)
+            )
+        graph.link_arrays()
+        return graph
+
+    def link_arrays(self):
+        """
+        Compute the reverse links, out-degrees and dangling pages from
+        the forward links.
+        """
+        self.reverse = [[] for _ in self.pages]
+        for i, links in enumerate(self.forward):
+            for j in links:
+                self.reverse[j].append(i)
+
+        self.out_degree = [len(links) for links in self.forward]
+        self.dangling = [
+            i for i, degree in enumerate(self.out_degree) if degree == 0
+        ]
+
+    def csr(self):
+        """
+        Return the forward links as NumPy arrays `(offsets, links)`, where
+        page i links to links[offsets[i]:offsets[i + 1]].
+        """
+        import numpy as np
+
+        if not hasattr(self, "_csr"):
+            offsets = np.zeros(len(self.pages) + 1, dtype=np.int64)
+            np.cumsum(self.out_degree, out=offsets[1:])
+            links = np.fromiter(
+                (j for links in self.forward for j in links),
+                dtype=np.int64, count=int(offsets[-1])
+            )
+            self._csr = (offsets, links)
+        return self._csr
+
+    def dump(self):
+        """
+        Return the graph as a compact JSON-serializable dictionary: the
+        page names, and the links as flat CSR lists of page numbers.
+        """
+        offsets = [0]
+        for degree in self.out_degree:
+            offsets.append(offsets[-1] + degree)
+        return {
+            "pages": self.pages,
+            "offsets": offsets,
+            "links": [j for links in self.forward for j in links]
+        }
+
+    def export(self, path):
+        """
+        Write the links to `path` in the binary edge format read by
+        `mmap_pagerank`, numbering pages as in `pages`.
+        """
+        write_edges(path, *self.csr())
+
+    @classmethod
+    def load(cls, data):
+        """
+        Return the graph saved by `dump` as `data`.
+        """
+        pages = data["pages"]
+        offsets = data["offsets"]
+        links = data["links"]
+        return cls({
+            page: set(pages[j] for j in links[offsets[i]:offsets[i + 1]])
+            for i, page in enumerate(pages)
+        })
+
+    def ranks(self, values):
+        """
+        Return a dictionary mapping each page to its entry in `values`.
+        """
+        return {page: values[i] for i, page in enumerate(self.pages)}
+
+
+def link_graph(corpus):
+    """
+    Return `corpus` as a LinkGraph, building one if needed.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph(corpus)
 
 
 def transition_model(corpus, page, damping_factor):
@@ -78,16 +417,10 @@ def transition_model(corpus, page, damping_factor):
     return probs
 
 def get_random_page(probs):
-    # generate a random number between 1 - 100
-    rand_num = math.floor(random.random() * 100) + 1
-    sum = 0
-    # iterate through all the probabilites and sum them. 
-    # The random page will be the one where the random number falls in the range of the prev sum + the next probability in the distributioin
-    for page in probs:
-        sum += (probs[page] * 100)
-        if rand_num <= sum:
-            return page
-    return list(probs.keys())[-1]
+    """
+    Return a page chosen at random according to the distribution `probs`.
+    """
+    return random.choices(list(probs), weights=list(probs.values()))[0]
 
 def remove_suffix(input_string, suffix):
     if suffix and input_string.endswith(suffix):
@@ -103,70 +436,645 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    probs = dict()
-    # initialize return dictionary
-    for page in corpus:
-        probs[page] = 0
-    num_pages = len(corpus)
-    # randomly generate the first page
-    curr_page = math.floor(random.random() * num_pages) + 1
-    num_pages = 1
-    for page in corpus:
-        if num_pages == curr_page:
-            curr_page = page
-        num_pages += 1
-    probs[curr_page] = 1
-
-    # run for n -1 remaining samples
-    for i in range(1, n):
-        next_prob = transition_model(corpus, remove_suffix(curr_page, ".html"), damping_factor)
-        curr_page = get_random_page(next_prob)
-        probs[curr_page] += 1
-    
+    graph = link_graph(corpus)
+    num_pages = len(graph.pages)
+    counts = [0] * num_pages
+
+    # Follow a random surfer directly instead of building the transition
+    # model's distribution at every step, so each sample costs O(1):
+    # with probability `damping_factor` it follows a random link, and
+    # otherwise (or if the page has no links) it jumps to any page
+    rand = random.random
+    forward = graph.forward
+    page = int(rand() * num_pages)
+    counts[page] += 1
+    for _ in range(1, n):
+        links = forward[page]
+        if links and rand() < damping_factor:
+            page = links[int(rand() * len(links))]
+        else:
+            page = int(rand() * num_pages)
+        counts[page] += 1
+
     # get the distrubtion of the samples by dividing by total number of samples
-    for page in probs:
-        probs[page] = probs[page] / n
-    
-    return probs
+    return graph.ranks([count / n for count in counts])
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, initial=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
+    If `initial` is given, iteration starts from those PageRank values
+    (e.g. the result of an earlier run on a slightly different corpus)
+    instead of from the uniform distribution; pages it does not mention
+    start at 1 / N.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    iterate_pr = dict()
-    # diff is a flag used to terminate the loop when the difference in no longer greater than 0.001
-    diff = True
+    return solve_pagerank(
+        corpus, damping_factor, method="power", norm="max",
+        tolerance=0.001, initial=initial
+    ).ranks
 
-    # initially, all pages take equal probability
-    for page in corpus:
-        iterate_pr[page] = 1 / len(corpus)
-    
-    while diff is True:
-        diff = False
-        prev_pr = iterate_pr.copy()
-        for page in iterate_pr:
-            # left hand side of the iteration formula
-            new_pr = ((1 - damping_factor) / len(corpus))
-            parents = [link for link in corpus if page in corpus[link]]
-            summation = 0
-
-            # summation part of the iteration formula
-            for parent in parents:
-                summation = summation + (prev_pr[parent] / len(corpus[parent]))
-            #right hand side of the iteration formula
-            new_pr = new_pr + (damping_factor * summation)
-            if abs(new_pr - prev_pr[page]) > 0.001:
-                diff = True
-            iterate_pr[page] = new_pr
-    dictsum = (sum(iterate_pr.values()))
-    iterate_pr = {key: value/dictsum for key, value in iterate_pr.items()}
-    return iterate_pr
+
+class PageRankResult():
+    """
+    Result of `solve_pagerank`: the PageRank values (`ranks`, a dictionary
+    from page to value), the number of iterations (`iterations`), and the
+    norm of the change made by each iteration (`residuals`).
+    """
+
+    def __init__(self, ranks, iterations, residuals):
+        self.ranks = ranks
+        self.iterations = iterations
+        self.residuals = residuals
+
+
+# Ways of measuring the change made by an iteration
+NORMS = {
+    "l1": lambda changes: sum(abs(change) for change in changes),
+    "l2": lambda changes: math.sqrt(sum(change ** 2 for change in changes)),
+    "max": lambda changes: max((abs(change) for change in changes), default=0)
+}
+
+SOLVERS = ("power", "gauss-seidel", "quadratic")
+
+
+def solve_pagerank(corpus, damping_factor, method="power", norm="l1",
+                   tolerance=1e-8, max_iterations=1000, initial=None,
+                   period=10):
+    """
+    Return a PageRankResult computed with one of several iterative
+    methods, stopping once the `norm` ("l1", "l2" or "max") of the change
+    made by an iteration is at most `tolerance`:
+
+        power         plain power iteration, as in `iterate_pagerank`
+        gauss-seidel  sweeps that use each page's new value as soon as it
+                      is computed, which usually halves the iterations
+        quadratic     power iteration, applying quadratic extrapolation
+                      (fitting the last four iterates) every `period` steps
+
+    If `initial` is given, iteration starts from those PageRank values.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown method: {method}")
+    measure = NORMS[norm]
+    graph = link_graph(corpus)
+    n = len(graph.pages)
+
+    ranks = [1 / n] * n
+    if initial is not None:
+        ranks = [initial.get(page, 1 / n) for page in graph.pages]
+        total = sum(ranks)
+        ranks = [rank / total for rank in ranks]
+
+    residuals = []
+    history = [ranks]
+    while len(residuals) < max_iterations:
+        if method == "gauss-seidel":
+            new_ranks = gauss_seidel_step(graph, damping_factor, ranks)
+        else:
+            new_ranks = power_step(graph, damping_factor, ranks)
+
+        residual = measure([new - old for new, old in zip(new_ranks, ranks)])
+        residuals.append(residual)
+
+        ranks = new_ranks
+        if residual <= tolerance:
+            break
+
+        if method == "quadratic":
+            history = history[-3:] + [ranks]
+            if len(history) == 4 and len(residuals) % period == 0:
+                ranks = quadratic_extrapolation(history)
+                history = [ranks]
+
+    total = sum(ranks)
+    return PageRankResult(
+        graph.ranks([rank / total for rank in ranks]),
+        len(residuals), residuals
+    )
+
+
+def power_step(graph, damping_factor, ranks):
+    """
+    Return the PageRank values after one step of power iteration from
+    `ranks`.
+    """
+    n = len(ranks)
+
+    # a page with no links counts as linking to every page, itself included
+    dangling = sum(ranks[i] for i in graph.dangling)
+    base = (1 - damping_factor) / n + damping_factor * dangling / n
+
+    # share of each page's rank passed along each of its links
+    shares = [
+        rank / degree if degree else 0
+        for rank, degree in zip(ranks, graph.out_degree)
+    ]
+    return [
+        base + damping_factor * sum(shares[j] for j in parents)
+        for parents in graph.reverse
+    ]
+
+
+def gauss_seidel_step(graph, damping_factor, ranks):
+    """
+    Return the PageRank values after one Gauss-Seidel sweep from `ranks`,
+    in which each page's new value is used as soon as it is computed.
+    """
+    n = len(ranks)
+    ranks = list(ranks)
+    degree = graph.out_degree
+    dangling = sum(ranks[i] for i in graph.dangling)
+    for i, parents in enumerate(graph.reverse):
+        new = (1 - damping_factor + damping_factor * dangling) / n
+        new += damping_factor * sum(ranks[j] / degree[j] for j in parents)
+        if not degree[i]:
+            dangling += new - ranks[i]
+        ranks[i] = new
+
+    # Sweeps do not preserve the total, so rescale it to 1
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+def quadratic_extrapolation(history):
+    """
+    Return the quadratic extrapolation (Kamvar et al., 2003) of the four
+    iterates in `history`, which removes the error along the second and
+    third eigenvectors of the iteration.
+    """
+    x0, x1, x2, x3 = history
+    y1 = [b - a for a, b in zip(x0, x1)]
+    y2 = [b - a for a, b in zip(x0, x2)]
+    y3 = [b - a for a, b in zip(x0, x3)]
+
+    # Least-squares solution of [y1 y2] (g1, g2) = -y3
+    a = sum(u * u for u in y1)
+    b = sum(u * v for u, v in zip(y1, y2))
+    c = sum(v * v for v in y2)
+    p = sum(u * w for u, w in zip(y1, y3))
+    q = sum(v * w for v, w in zip(y2, y3))
+    determinant = a * c - b * b
+    if abs(determinant) <= 1e-30:
+        return x3
+    g1 = (-p * c + q * b) / determinant
+    g2 = (-q * a + p * b) / determinant
+
+    b0, b1, b2 = g1 + g2 + 1, g2 + 1, 1
+    ranks = [
+        max(b0 * u + b1 * v + b2 * w, 0) for u, v, w in zip(x1, x2, x3)
+    ]
+    total = sum(ranks)
+    if total <= 0:
+        return x3
+    return [rank / total for rank in ranks]
+
+
+def update_pagerank(corpus, damping_factor, ranks, added=(), removed=(),
+                    tolerance=1e-10):
+    """
+    Return PageRank values after a few links change, starting from the
+    PageRank values `ranks` of `corpus` before the change.
+
+    `added` and `removed` are iterables of (page, link) pairs. The update
+    pushes residuals (the amount by which each page's value is off) out
+    from the pages whose links changed, visiting only pages whose residual
+    is above `tolerance` / N, so the work stays near the changes. This
+    works on the unnormalized system y = (1 - d) / N + d * A y, in which
+    pages without links pass nothing on; its solution is PageRank up to
+    scaling, and an exact old solution carries over to it exactly. If the
+    set of pages changes, every page's share of the random jump changes,
+    so this falls back to power iteration started from `ranks`, run until
+    an iteration changes the values by at most `tolerance` in L1 norm.
+
+    Return a pair: the new LinkGraph, and a dictionary of PageRank values.
+    """
+    old = link_graph(corpus)
+    pages = {page: set(links) for page, links in old.items()}
+    for page, link in removed:
+        pages[page].discard(link)
+    for page, link in added:
+        pages.setdefault(page, set())
+        pages.setdefault(link, set())
+        if link != page:
+            pages[page].add(link)
+    graph = LinkGraph(pages)
+    if graph.pages != old.pages:
+        return graph, solve_pagerank(
+            graph, damping_factor, norm="l1", tolerance=tolerance,
+            initial=ranks
+        ).ranks
+
+    n = len(graph.pages)
+    values = [ranks[page] for page in graph.pages]
+    dangling = sum(values[i] for i in old.dangling)
+    scale = (1 - damping_factor) / (
+        1 - damping_factor + damping_factor * dangling
+    )
+    values = [value * scale for value in values]
+
+    # Only pages linked to by a changed page start with a residual: what
+    # the changed page passes on now, minus what it passed on before
+    residual = dict()
+    changed = set(page for page, _ in added)
+    changed.update(page for page, _ in removed)
+    for page in changed:
+        i = graph.index[page]
+        for links, degree, sign in (
+            (old.forward[i], old.out_degree[i], -1),
+            (graph.forward[i], graph.out_degree[i], 1)
+        ):
+            share = sign * damping_factor * values[i] / max(degree, 1)
+            for j in links:
+                residual[j] = residual.get(j, 0) + share
+
+    # Push in first-in, first-out order, which spreads each change out
+    # one link at a time like a sweep of iteration limited to the pages
+    # it has reached
+    threshold = tolerance / n
+    queue = deque(j for j in residual if abs(residual[j]) > threshold)
+    queued = set(queue)
+    while queue:
+        i = queue.popleft()
+        queued.discard(i)
+        amount = residual.pop(i, 0)
+        values[i] += amount
+        degree = graph.out_degree[i]
+        if not degree:
+            continue
+        share = damping_factor * amount / degree
+        for j in graph.forward[i]:
+            residual[j] = residual.get(j, 0) + share
+            if abs(residual[j]) > threshold and j not in queued:
+                queued.add(j)
+                queue.append(j)
+
+    total = sum(values)
+    return graph, graph.ranks([value / total for value in values])
+
+
+def matrix_pagerank(corpus, damping_factor, tolerance=1e-10,
+                    max_iterations=1000):
+    """
+    Return PageRank values for each page by power iteration over a sparse
+    column-stochastic link matrix, stopping once the L1 norm of the change
+    between iterations falls below `tolerance`.
+
+    The matrix is built once in CSR form (row = linking-to page, column =
+    linking-from page), and each iteration is a single sparse mat-vec.
+    Pages without links are treated as linking to every page, by spreading
+    their rank evenly instead of storing a dense column for them.
+
+    Requires NumPy; uses SciPy for the mat-vec when it is installed.
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    import numpy as np
+
+    graph = link_graph(corpus)
+    n = len(graph.pages)
+    multiply = link_matrix(graph)
+    dangling = np.array(graph.out_degree) == 0
+
+    ranks = np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        dangling_rank = ranks[dangling].sum()
+        teleport = (1 - damping_factor + damping_factor * dangling_rank) / n
+        new_ranks = damping_factor * multiply(ranks) + teleport
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    ranks /= ranks.sum()
+    return graph.ranks(ranks.tolist())
+
+
+def link_matrix(graph):
+    """
+    Return a function that multiplies a vector of PageRank values, or an
+    array with one column of values per vector, by the column-stochastic
+    link matrix of `graph`, so that each page passes its rank evenly
+    along its links. Pages without links pass nothing on.
+
+    The matrix is built once from the graph's CSR links. Requires NumPy;
+    uses SciPy for the products when it is installed.
+    """
+    import numpy as np
+
+    offsets, links = graph.csr()
+    n = len(graph.pages)
+    degree = np.diff(offsets)
+    sources = np.repeat(np.arange(n), degree)
+    data = 1 / degree[sources]
+
+    try:
+        from scipy.sparse import csc_matrix
+
+        # column i holds page i's links, so the CSR arrays are used as is
+        matrix = csc_matrix((data, links, offsets), shape=(n, n)).tocsr()
+
+        def multiply(ranks):
+            return matrix @ ranks
+    except ImportError:
+        def multiply(ranks):
+            weights = data.reshape((-1,) + (1,) * (ranks.ndim - 1))
+            result = np.zeros(ranks.shape)
+            np.add.at(result, links, weights * ranks[sources])
+            return result
+    return multiply
+
+
+def personalized_pagerank(corpus, damping_factor, teleports,
+                          tolerance=1e-10, max_iterations=1000):
+    """
+    Return personalized PageRank values for each teleport distribution
+    in `teleports`.
+
+    Each entry of `teleports` is either a dictionary mapping pages to
+    weights, or a collection of seed pages that share the weight equally
+    (topic-sensitive PageRank). With probability `1 - damping_factor`
+    the surfer jumps to a page drawn from that distribution instead of
+    from all pages, and pages without links also send their rank there.
+
+    All the distributions are solved together by block power iteration
+    on an N x B array with one column per distribution, so every pass
+    over the link matrix serves all of them. Iteration stops once the L1
+    change of every column falls below `tolerance`.
+
+    Requires NumPy; uses SciPy for the products when it is installed.
+    Return a list with one dictionary per entry of `teleports`, mapping
+    each page to its PageRank value; the values in each sum to 1.
+    """
+    import numpy as np
+
+    graph = link_graph(corpus)
+    n = len(graph.pages)
+    multiply = link_matrix(graph)
+    dangling = np.array(graph.out_degree) == 0
+
+    jumps = np.zeros((n, len(teleports)))
+    for column, teleport in enumerate(teleports):
+        if not isinstance(teleport, dict):
+            teleport = dict.fromkeys(teleport, 1)
+        for page, weight in teleport.items():
+            if page not in graph.index:
+                raise ValueError(f"Unknown page: {page}")
+            if weight < 0:
+                raise ValueError(f"Negative teleport weight for {page}")
+            jumps[graph.index[page], column] = weight
+        total = jumps[:, column].sum()
+        if total <= 0:
+            raise ValueError(f"Teleport distribution {column} is empty")
+        jumps[:, column] /= total
+
+    ranks = jumps.copy()
+    for _ in range(max_iterations):
+        lost = 1 - damping_factor + damping_factor * ranks[dangling].sum(0)
+        new_ranks = damping_factor * multiply(ranks) + lost * jumps
+        change = np.abs(new_ranks - ranks).sum(0)
+        ranks = new_ranks
+        if change.max(initial=0) < tolerance:
+            break
+
+    ranks /= ranks.sum(0)
+    return [graph.ranks(column.tolist()) for column in ranks.T]
+
+
+# Start of a binary edge file, followed by the number of pages, the
+# number of links and the bytes per page number as little-endian uint64s
+EDGES_MAGIC = b"PRLINKS1"
+
+
+def write_edges(path, offsets, links, chunk_pages=1 << 20):
+    """
+    Write the CSR links `(offsets, links)` to `path` as a binary edge
+    file: a header, then every link as a (from, to) pair of page numbers,
+    sorted by the linking page. Page numbers are 32-bit when they fit.
+    """
+    import numpy as np
+
+    n = len(offsets) - 1
+    itemsize = 4 if n < 1 << 31 else 8
+    dtype = np.dtype(f"<i{itemsize}")
+    header = np.array([n, offsets[-1], itemsize], dtype="<u8")
+    with open(path, "wb") as f:
+        f.write(EDGES_MAGIC)
+        f.write(header.tobytes())
+        for start in range(0, n, chunk_pages):
+            stop = min(start + chunk_pages, n)
+            degree = np.diff(offsets[start:stop + 1])
+            pairs = np.empty((int(degree.sum()), 2), dtype=dtype)
+            pairs[:, 0] = np.repeat(np.arange(start, stop), degree)
+            pairs[:, 1] = links[offsets[start]:offsets[stop]]
+            f.write(pairs.tobytes())
+
+
+def read_edges(path):
+    """
+    Return the number of pages in the binary edge file `path`, and its
+    links as a read-only memory-mapped array of (from, to) rows.
+    """
+    import numpy as np
+
+    with open(path, "rb") as f:
+        if f.read(len(EDGES_MAGIC)) != EDGES_MAGIC:
+            raise ValueError(f"Not a binary edge file: {path}")
+        n, m, itemsize = np.frombuffer(f.read(24), dtype="<u8").tolist()
+    if m == 0:
+        return n, np.empty((0, 2), dtype=f"<i{itemsize}")
+    edges = np.memmap(
+        path, dtype=f"<i{itemsize}", mode="r",
+        offset=len(EDGES_MAGIC) + 24, shape=(m, 2)
+    )
+    return n, edges
+
+
+def mmap_pagerank(path, damping_factor, ranks_file=None, dtype="float64",
+                  tolerance=1e-10, max_iterations=1000,
+                  chunk_size=1 << 22):
+    """
+    Return PageRank values for the pages of the binary edge file `path`
+    (see `LinkGraph.export`) by power iteration, for graphs too large to
+    hold in memory.
+
+    Each iteration streams over the memory-mapped links `chunk_size`
+    links at a time. Chunks end on a page boundary, so each page's links
+    are all in one chunk and its out-degree is the length of its run.
+    The only per-page state is the current and next PageRank vectors,
+    kept as `dtype` memory maps: the result in `ranks_file` (by default
+    `path` + ".ranks") and a scratch file beside it. Iteration stops once
+    the L1 change between iterations falls below `tolerance`.
+
+    Requires NumPy. Return the memory-mapped array of PageRank values,
+    indexed by page number; `LinkGraph.ranks` turns it into a dictionary.
+    """
+    import numpy as np
+
+    n, edges = read_edges(path)
+    if ranks_file is None:
+        ranks_file = path + ".ranks"
+    scratch_file = ranks_file + ".tmp"
+    ranks = np.memmap(ranks_file, dtype=dtype, mode="w+", shape=(n,))
+    new_ranks = np.memmap(scratch_file, dtype=dtype, mode="w+", shape=(n,))
+    result = ranks
+
+    # Chunk boundaries, each moved forward to the end of a page's links
+    bounds = [0]
+    while bounds[-1] < len(edges):
+        stop = min(bounds[-1] + chunk_size, len(edges))
+        page = edges[stop - 1, 0]
+        while stop < len(edges) and edges[stop, 0] == page:
+            ahead = np.asarray(edges[stop:stop + 4096, 0])
+            stop += int(np.argmin(ahead == page)) or len(ahead)
+        bounds.append(stop)
+
+    block = chunk_size
+    for start in range(0, n, block):
+        ranks[start:start + block] = 1 / n
+    total = 1
+    for _ in range(max_iterations):
+        for start in range(0, n, block):
+            new_ranks[start:start + block] = 0
+
+        # Spread each linking page's rank over its links
+        linked = 0
+        for start, stop in zip(bounds, bounds[1:]):
+            pairs = np.asarray(edges[start:stop])
+            first = np.flatnonzero(
+                np.append(True, pairs[1:, 0] != pairs[:-1, 0])
+            )
+            degree = np.diff(np.append(first, len(pairs)))
+            rank = ranks[pairs[first, 0]].astype(np.float64)
+            linked += rank.sum()
+            np.add.at(
+                new_ranks, pairs[:, 1],
+                np.repeat(damping_factor * rank / degree, degree)
+            )
+
+        # Pages without links spread their rank over every page
+        teleport = (
+            1 - damping_factor + damping_factor * (total - linked)
+        ) / n
+        change = 0
+        total = 0
+        for start in range(0, n, block):
+            new = new_ranks[start:start + block]
+            new += teleport
+            change += np.abs(new - ranks[start:start + block]).sum()
+            total += new.sum(dtype=np.float64)
+        ranks, new_ranks = new_ranks, ranks
+        if change < tolerance:
+            break
+
+    for start in range(0, n, block):
+        result[start:start + block] = ranks[start:start + block] / total
+    result.flush()
+    del ranks, new_ranks
+    os.remove(scratch_file)
+    return result
+
+
+def walker_pagerank(corpus, damping_factor, n, walkers=1000, batches=32,
+                    processes=None, seed=None, confidence=0.95):
+    """
+    Return PageRank values for each page by sampling `n` pages with many
+    independent random surfers at once, along with confidence intervals.
+
+    The surfers are NumPy arrays of current pages, and each step moves
+    all of them with a vectorized gather over the graph's CSR links.
+    Surfers are split into `batches` groups whose estimates are
+    independent, and the spread between groups gives a normal confidence
+    interval at level `confidence` for every page. With `processes`, the
+    groups are divided among that many worker processes, each with its
+    own random stream spawned from `seed`.
+
+    Requires NumPy. Return a pair of dictionaries: one mapping each page
+    to its estimated PageRank, and one mapping each page to a
+    (low, high) interval.
+    """
+    import numpy as np
+    from statistics import NormalDist
+
+    if batches < 2:
+        raise ValueError("Confidence intervals need at least 2 batches")
+    graph = link_graph(corpus)
+    offsets, links = graph.csr()
+    walkers = max(walkers, batches)
+    steps = -(-n // walkers)
+
+    # Spread surfers and random streams over the worker processes
+    chunks = min(processes or 1, batches)
+    streams = np.random.SeedSequence(seed).spawn(chunks)
+    sizes = [batches // chunks + (k < batches % chunks) for k in range(chunks)]
+    jobs = [
+        (offsets, links, damping_factor, walkers * size // batches, size,
+         steps, stream)
+        for size, stream in zip(sizes, streams)
+    ]
+    if processes:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=chunks) as pool:
+            counts = list(pool.map(walk_batches, *zip(*jobs)))
+    else:
+        counts = [walk_batches(*job) for job in jobs]
+    counts = np.vstack(counts)
+
+    # Each row is one group's estimate; the mean and spread across groups
+    # give the estimate and its standard error
+    estimates = counts / counts.sum(axis=1, keepdims=True)
+    ranks = estimates.mean(axis=0)
+    error = estimates.std(axis=0, ddof=1) / np.sqrt(len(estimates))
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    intervals = [
+        (max(0.0, float(rank - z * e)), float(rank + z * e))
+        for rank, e in zip(ranks, error)
+    ]
+    return graph.ranks(ranks.tolist()), graph.ranks(intervals)
+
+
+def walk_batches(offsets, links, damping_factor, walkers, batches, steps,
+                 seed):
+    """
+    Move `walkers` random surfers `steps` times, split evenly into
+    `batches` groups. Return an array with one row per group counting
+    how often its surfers visited each page.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    num_pages = len(offsets) - 1
+    degree = np.diff(offsets)
+    group = np.arange(walkers) % batches
+
+    pages = rng.integers(num_pages, size=walkers)
+    counts = np.bincount(
+        group * num_pages + pages, minlength=batches * num_pages
+    )
+    for _ in range(1, steps):
+        pages_degree = degree[pages]
+        follow = (rng.random(walkers) < damping_factor) & (pages_degree > 0)
+        jump = rng.integers(num_pages, size=walkers)
+        if len(links) == 0:
+            # No page has links, so every surfer jumps
+            pages = jump
+        else:
+            choice = offsets[pages] + (
+                rng.random(walkers) * pages_degree
+            ).astype(np.int64)
+            choice = np.minimum(choice, len(links) - 1)
+            pages = np.where(follow, links[choice], jump)
+        counts += np.bincount(
+            group * num_pages + pages, minlength=batches * num_pages
+        )
+    return counts.reshape(batches, num_pages)
 
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ class Variable():
     ACROSS = "across"
     DOWN = "down"
 
+    __slots__ = ("i", "j", "direction", "length", "cells", "_hash")
+
     def __init__(self, i, j, direction, length):
         """Create a new variable with starting point, direction, and length."""
         self.i = i
@@ -15,9 +17,10 @@ class Variable():
                 (self.i + (k if self.direction == Variable.DOWN else 0),
                  self.j + (k if self.direction == Variable.ACROSS else 0))
             )
+        self._hash = hash((self.i, self.j, self.direction, self.length))
 
     def __hash__(self):
-        return hash((self.i, self.j, self.direction, self.length))
+        return self._hash
 
     def __eq__(self, other):
         return (
@@ -105,29 +108,27 @@ class Crossword():
                         ))
 
         # Compute overlaps for each word
-        # For any pair of variables v1, v2, their overlap is either:
-        #    None, if the two variables do not overlap; or
-        #    (i, j), where v1's ith character overlaps v2's jth character
+        # For any pair of overlapping variables v1, v2, their overlap is
+        #    (i, j), where v1's ith character overlaps v2's jth character;
+        # pairs that do not overlap are left out, so use overlaps.get
         self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        self.adjacency = {var: set() for var in self.variables}
+        cells = dict()
+        for var in self.variables:
+            for k, cell in enumerate(var.cells):
+                cells.setdefault(cell, []).append((var, k))
+        for sharing in cells.values():
+            for v1, k1 in sharing:
+                for v2, k2 in sharing:
+                    if v1 != v2:
+                        self.overlaps[v1, v2] = (k1, k2)
+                        self.adjacency[v1].add(v2)
+        # Frozen, so that callers of neighbors cannot change the puzzle
+        self.adjacency = {
+            var: frozenset(adjacent)
+            for var, adjacent in self.adjacency.items()
+        }
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.adjacency[var]
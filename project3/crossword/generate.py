@@ -1,4 +1,6 @@
+import random
 import sys
+import time
 
 from collections import deque
 
@@ -7,16 +9,119 @@ from crossword import Crossword, Variable
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    # Ways of ordering a variable's values: "exact" counts the values each
+    # one rules out in the current domains of its neighbors, "approximate"
+    # estimates that count from the whole vocabulary
+    ORDERINGS = ("exact", "approximate")
+
+    # Ways of searching: "backtrack" maintains arc consistency and steps
+    # back one variable at a time; "cbj" uses forward checking with
+    # conflict-directed backjumping, dom/wdeg variable ordering and
+    # randomized restarts
+    SOLVERS = ("backtrack", "cbj")
+
+    # Failures allowed before the first restart; later runs allow this
+    # many times the next term of the Luby sequence
+    RESTART_UNIT = 10000
+
+    def __init__(self, crossword, ordering="exact", solver="backtrack",
+                 time_limit=None, seed=None):
         """
         Create new CSP crossword generate.
+
+        `solve` gives up and returns None after `time_limit` seconds, if
+        given. `seed` seeds the random choices of the "cbj" solver.
         """
+        if ordering not in self.ORDERINGS:
+            raise ValueError(f"Unknown ordering: {ordering}")
+        if solver not in self.SOLVERS:
+            raise ValueError(f"Unknown solver: {solver}")
         self.crossword = crossword
+        self.ordering = ordering
+        self.solver = solver
+        self.time_limit = time_limit
+        self.random = random.Random(seed)
+        self.deadline = None
+
+        # Group the words by length, numbering the words of each length
+        # so that a domain can be a bitset over them: bit k of the domain
+        # of `var` is set when self.words[var.length][k] is in it
+        self.words = dict()
+        for word in sorted(self.crossword.words):
+            self.words.setdefault(len(word), []).append(word)
+        self.numbers = dict()
+        for words in self.words.values():
+            for k, word in enumerate(words):
+                self.numbers[word] = k
+
+        # Words of each length with a given letter at a given position,
+        # as bitsets, built a byte at a time so that startup memory is
+        # proportional to the vocabulary
+        self.letters = dict()
+        for length, words in self.words.items():
+            size = len(words) // 8 + 1
+            tables = [dict() for _ in range(length)]
+            for k, word in enumerate(words):
+                for position, letter in enumerate(word):
+                    if letter not in tables[position]:
+                        tables[position][letter] = bytearray(size)
+                    tables[position][letter][k >> 3] |= 1 << (k & 7)
+            for position, table in enumerate(tables):
+                self.letters[length, position] = {
+                    letter: int.from_bytes(bits, "little")
+                    for letter, bits in table.items()
+                }
+
+        # Number of words of each length with a given letter at a given
+        # position, and number of words of each length
+        self.frequency = {
+            key: {
+                letter: words.bit_count()
+                for letter, words in by_letter.items()
+            }
+            for key, by_letter in self.letters.items()
+        }
+        self.counts = {
+            length: len(words) for length, words in self.words.items()
+        }
+
+        # Every domain starts as all the words of its variable's length,
+        # so no word of another length is ever stored in it
         self.domains = {
-            var: self.crossword.words.copy()
+            var: (1 << self.counts.get(var.length, 0)) - 1
             for var in self.crossword.variables
         }
 
+        # Variables overlapping each variable, as lists
+        self.neighbors = {
+            var: list(self.crossword.neighbors(var))
+            for var in self.crossword.variables
+        }
+
+        # Number of calls to `revise` that compared two domains, number
+        # of values they removed, number of values tried in search, and
+        # how the "cbj" solver's search went
+        self.stats = {
+            "revisions": 0, "pruned": 0, "assignments": 0,
+            "backjumps": 0, "restarts": 0, "timed_out": False
+        }
+
+        # For the "cbj" solver: the assigned variables whose forward
+        # checks pruned each variable's domain, in assignment order, and
+        # the weight of the constraint between each pair of variables,
+        # raised every time it empties a domain
+        self.pruned_by = {var: [] for var in self.crossword.variables}
+        self.weights = dict()
+
+        # Failures in the current run of the "cbj" solver, and how many
+        # it may have before restarting
+        self.failures = 0
+        self.limit = None
+
+        # Domains as they were before each change made during search, so
+        # that backtracking can undo the changes instead of copying domains
+        self.trail = []
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -87,25 +192,49 @@ class CrosswordCreator():
 
         img.save(filename)
 
+    def values(self, var):
+        """
+        Return a list of the words in the domain of `var`.
+        """
+        words = self.words.get(var.length, [])
+        return [words[k] for k in members(self.domains[var])]
+
     def solve(self):
         """
         Enforce node and arc consistency, and then solve the CSP.
         """
         self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        if not self.ac3():
+            return None
+
+        if self.time_limit is not None:
+            self.deadline = time.perf_counter() + self.time_limit
+        try:
+            if self.solver == "cbj":
+                return self.restarts()
+            return self.backtrack(dict())
+        except TimeLimit:
+            self.stats["timed_out"] = True
+            return None
+
+    def check_time(self):
+        """
+        Raise TimeLimit if the time allowed for solving has run out.
+        """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise TimeLimit()
 
     def enforce_node_consistency(self):
         """
         Update `self.domains` such that each variable is node-consistent.
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
+
+        Domains only ever hold words from the bucket of their variable's
+        length, so this just keeps each domain within its bucket.
         """
         for var in self.domains:
-            copy = self.domains[var].copy()
-            for value in copy:
-                if len(value) != var.length:
-                    self.domains[var].remove(value)
+            self.domains[var] &= (1 << self.counts.get(var.length, 0)) - 1
 
     def revise(self, x, y):
         """
@@ -116,25 +245,43 @@ class CrosswordCreator():
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
         """
-        intersection = self.crossword.overlaps[x, y]
+        intersection = self.crossword.overlaps.get((x, y))
         if intersection is None:
             return False
-        
-        change = False
-        x_words = self.domains[x].copy()
-        y_words = self.domains[y].copy()
-
-        for x_word in x_words:
-            found = False
-            for y_word in y_words:
-                if x_word[intersection[0]] == y_word[intersection[1]]:
-                    found = True
-                    break
-            if not found:
-                self.domains[x].remove(x_word)
-                change = True
-
-        return change
+        i, j = intersection
+
+        # Keep the words of `x` whose letter at the overlap is the letter
+        # of at least one word left for `y`
+        x_letters = self.letters.get((x.length, i), dict())
+        y_letters = self.letters.get((y.length, j), dict())
+        supported = 0
+        for letter, words in y_letters.items():
+            if self.domains[y] & words:
+                supported |= x_letters.get(letter, 0)
+
+        revised = self.domains[x] & supported
+        self.stats["revisions"] += 1
+        if revised == self.domains[x]:
+            return False
+        self.stats["pruned"] += (self.domains[x] ^ revised).bit_count()
+        self.set_domain(x, revised)
+        return True
+
+    def set_domain(self, var, domain):
+        """
+        Replace the domain of `var` with `domain`, remembering the old one
+        on the trail.
+        """
+        self.trail.append((var, self.domains[var]))
+        self.domains[var] = domain
+
+    def undo(self, mark):
+        """
+        Restore the domains changed since the trail had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, domain = self.trail.pop()
+            self.domains[var] = domain
 
     def ac3(self, arcs=None):
         """
@@ -146,26 +293,32 @@ class CrosswordCreator():
         return False if one or more domains end up empty.
         """
         if arcs is None:
-            arcs = []
-            for var in self.domains:
-                for var_2 in self.domains:
-                    if var == var_2:
-                        continue
-                    elif self.crossword.overlaps[var, var_2] is not None:
-                        arcs.append((var, var_2))
-        while len(arcs) != 0:
-            (x, y) = arcs.pop(0)
+            arcs = [
+                (x, y) for x in self.domains for y in self.neighbors[x]
+            ]
+
+        # Queue each arc at most once at a time
+        queue = deque()
+        queued = set()
+        for arc in arcs:
+            if arc not in queued:
+                queue.append(arc)
+                queued.add(arc)
+
+        while queue:
+            arc = queue.popleft()
+            queued.remove(arc)
+            x, y = arc
             if self.revise(x, y):
-                if len(self.domains[x]) == 0:
+                if not self.domains[x]:
                     return False
-                for var in self.domains:
-                    if var == x:
-                        continue
-                    elif self.crossword.overlaps[x, var] is not None:
-                        arcs.append((x, var))
-        
-        return True
 
+                # Values of x's other neighbors may have lost their support
+                for z in self.neighbors[x]:
+                    if z != y and (z, x) not in queued:
+                        queue.append((z, x))
+                        queued.add((z, x))
+        return True
 
     def assignment_complete(self, assignment):
         """
@@ -177,32 +330,34 @@ class CrosswordCreator():
                 return False
         return True
 
-    def consistent(self, assignment):
+    def consistent(self, assignment, var=None):
         """
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
+
+        If `var` is given, the rest of `assignment` is known to be
+        consistent, so only the word just assigned to `var` is checked.
         """
-        words = set()
+        if var is None:
+            return all(
+                self.consistent(assignment, variable)
+                for variable in assignment
+            )
+
+        word = assignment[var]
+        if len(word) != var.length:
+            return False
 
-        for variable in assignment:
-            if assignment[variable] in words:
-                return False
-            else:
-                words.add(assignment[variable])
-            
-            if len(assignment[variable]) != variable.length:
+        for variable, other in assignment.items():
+            if other == word and variable != var:
                 return False
-            
-            neighbors = self.crossword.neighbors(variable)
-
-            for neighbor in neighbors:
-                intersection = self.crossword.overlaps[variable, neighbor]
-                if intersection is not None:
-                    if neighbor in assignment:
-                        if assignment[variable][intersection[0]] is not assignment[neighbor][intersection[1]]:
-                            return False
-        return True
 
+        for neighbor in self.neighbors[var]:
+            if neighbor in assignment:
+                i, j = self.crossword.overlaps[var, neighbor]
+                if word[i] != assignment[neighbor][j]:
+                    return False
+        return True
 
     def order_domain_values(self, var, assignment):
         """
@@ -211,26 +366,47 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
-        mapping = dict()
-        neighbors = self.crossword.neighbors(var)
-
-        for word in self.domains[var]:
-            count = 0
-            for neighbor in neighbors:
-                if neighbor not in assignment:
-                    if word in self.domains[neighbor]:
-                        count += 1
-            if mapping[count] is None:
-                mapping[count] = set()
-            mapping[count].add(word)
-        
-        ret_list = []
-
-        for count in sorted(mapping.keys()):
-            for word in mapping[count]:
-                ret_list.add(word)
-        
-        return ret_list
+        # For each unassigned neighbor, how many of its values have each
+        # letter where it overlaps `var`: a word for `var` rules out the
+        # neighbor's values with any other letter there
+        tables = []
+        for neighbor in self.neighbors[var]:
+            if neighbor in assignment:
+                continue
+            i, j = self.crossword.overlaps[var, neighbor]
+            key = (neighbor.length, j)
+            domain = self.domains[neighbor]
+            if self.ordering == "approximate":
+                size = self.counts.get(neighbor.length, 0)
+                counts = self.frequency.get(key, dict())
+                domain = 0
+            else:
+                size = domain.bit_count()
+                counts = {
+                    letter: (domain & words).bit_count()
+                    for letter, words in self.letters.get(key, dict()).items()
+                }
+
+            # Only a neighbor of the same length can hold the word itself
+            if neighbor.length != var.length:
+                domain = 0
+            tables.append((i, j, size, counts, domain))
+
+        def ruled_out(word):
+            total = 0
+            for i, j, size, counts, domain in tables:
+                total += size - counts.get(word[i], 0)
+
+                # The word itself can no longer be used by the neighbor
+                if domain >> self.numbers[word] & 1 and word[j] == word[i]:
+                    total += 1
+            return total
+
+        # Shuffle first so that the "cbj" solver breaks ties at random
+        values = self.values(var)
+        if self.solver == "cbj":
+            self.random.shuffle(values)
+        return sorted(values, key=ruled_out)
 
     def select_unassigned_variable(self, assignment):
         """
@@ -243,9 +419,10 @@ class CrosswordCreator():
         mappings = dict()
         for var in self.domains:
             if var not in assignment:
-                if len(self.domains[var]) not in mappings:
-                    mappings[len(self.domains[var])] = set()
-                mappings[len(self.domains[var])].add(var)
+                size = self.domains[var].bit_count()
+                if size not in mappings:
+                    mappings[size] = set()
+                mappings[size].add(var)
         
         least = sorted(mappings.keys())[0]
 
@@ -255,7 +432,7 @@ class CrosswordCreator():
         else:
             highest = None
             for item in mappings[least]:
-                if highest is None or len(self.crossword.neighbors(highest)) < len(self.crossword.neighbors(item)):
+                if highest is None or len(self.neighbors[highest]) < len(self.neighbors[item]):
                     highest = item
             return highest
 
@@ -270,19 +447,226 @@ class CrosswordCreator():
         """
         if self.assignment_complete(assignment):
             return assignment
-        
+
         var = self.select_unassigned_variable(assignment)
 
-        for value in self.domains[var]:
+        for value in self.order_domain_values(var, assignment):
+            self.check_time()
+            self.stats["assignments"] += 1
             assignment[var] = value
-            if self.consistent(assignment):
-                result = self.backtrack(assignment)
-                if result is not None:
-                    return result
-            assignment.pop(var, None)
-        
+            if self.consistent(assignment, var):
+                mark = len(self.trail)
+                if self.inference(assignment, var):
+                    result = self.backtrack(assignment)
+                    if result is not None:
+                        return result
+                self.undo(mark)
+            del assignment[var]
+
         return None
 
+    def inference(self, assignment, var):
+        """
+        Maintain arc consistency after assigning `var`: reduce its domain
+        to the assigned word, remove that word from every other unassigned
+        variable, and run AC-3 on the arcs into the changed variables.
+        Changes are recorded on the trail.
+
+        Return False if some domain ends up empty, True otherwise.
+        """
+        bit = 1 << self.numbers[assignment[var]]
+        self.set_domain(var, bit)
+        changed = [var]
+
+        # Each word can be used only once
+        for other in self.domains:
+            if other in assignment or other.length != var.length:
+                continue
+            if self.domains[other] & bit:
+                self.set_domain(other, self.domains[other] & ~bit)
+                if not self.domains[other]:
+                    return False
+                changed.append(other)
+
+        return self.ac3([
+            (z, x) for x in changed for z in self.neighbors[x]
+        ])
+
+    def restarts(self):
+        """
+        Search with `backjump`, restarting from the initial domains each
+        time a run fails more often than the Luby schedule allows. The
+        constraint weights learned by earlier runs are kept, and random
+        tie-breaking makes each run take a different path.
+
+        Return a complete assignment, or None if there is none.
+        """
+        mark = len(self.trail)
+        run = 1
+        while True:
+            self.failures = 0
+            self.limit = self.RESTART_UNIT * luby(run)
+            try:
+                return self.backjump(dict())[0]
+            except Restart:
+                self.undo(mark)
+                for var in self.pruned_by:
+                    self.pruned_by[var].clear()
+                self.stats["restarts"] += 1
+                run += 1
+
+    def backjump(self, assignment):
+        """
+        Extend `assignment` by forward checking with conflict-directed
+        backjumping.
+
+        Return a pair: a complete assignment and None, or None and the
+        conflict set of assigned variables responsible for the failure.
+        A caller whose variable is not in the conflict set cannot fix it
+        by choosing another value, so it passes the set straight up.
+        """
+        if self.assignment_complete(assignment):
+            return assignment, None
+
+        var = self.select_weighted_variable(assignment)
+
+        # Variables that pruned this one's domain share the blame for
+        # every value it runs out of
+        conflict = set(self.pruned_by[var])
+
+        for value in self.order_domain_values(var, assignment):
+            self.check_time()
+            self.stats["assignments"] += 1
+            assignment[var] = value
+            mark = len(self.trail)
+            pruned, wiped = self.forward_check(assignment, var)
+
+            if wiped is None:
+                result, jump = self.backjump(assignment)
+                if result is not None:
+                    return result, None
+            else:
+                key = frozenset((var, wiped))
+                self.weights[key] = self.weights.get(key, 1) + 1
+                jump = set(self.pruned_by[wiped])
+
+            self.undo(mark)
+            for other in pruned:
+                self.pruned_by[other].pop()
+            del assignment[var]
+
+            if var not in jump:
+                self.stats["backjumps"] += 1
+                return None, jump
+            conflict |= jump - {var}
+
+            self.failures += 1
+            if self.failures > self.limit:
+                raise Restart()
+
+        return None, conflict
+
+    def forward_check(self, assignment, var):
+        """
+        Reduce the domain of `var` to its assigned word, and remove the
+        values that conflict with it from every unassigned variable that
+        overlaps it or has the same length. Changes are recorded on the
+        trail, and `var` is added to `pruned_by` of each pruned variable.
+
+        Return a pair: the list of pruned variables, and the variable
+        whose domain became empty, or None.
+        """
+        bit = 1 << self.numbers[assignment[var]]
+        self.set_domain(var, bit)
+        neighbors = self.crossword.neighbors(var)
+
+        pruned = []
+        for other in self.domains:
+            if other in assignment:
+                continue
+            before = self.domains[other]
+            if other.length == var.length and before & bit:
+                self.set_domain(other, before & ~bit)
+            if other in neighbors:
+                self.revise(other, var)
+            if self.domains[other] != before:
+                pruned.append(other)
+                self.pruned_by[other].append(var)
+                if not self.domains[other]:
+                    return pruned, other
+        return pruned, None
+
+    def select_weighted_variable(self, assignment):
+        """
+        Return the unassigned variable with the smallest ratio of domain
+        size to weighted degree: the total weight of its constraints with
+        other unassigned variables. Ties are broken at random.
+        """
+        def score(var):
+            degree = sum(
+                self.weights.get(frozenset((var, neighbor)), 1)
+                for neighbor in self.neighbors[var]
+                if neighbor not in assignment
+            )
+            return (
+                self.domains[var].bit_count() / max(degree, 1),
+                self.random.random()
+            )
+
+        return min(
+            (var for var in self.domains if var not in assignment),
+            key=score
+        )
+
+
+class Restart(Exception):
+    """
+    Raised to abandon a run of the "cbj" solver and start again.
+    """
+
+
+class TimeLimit(Exception):
+    """
+    Raised when the time allowed for `CrosswordCreator.solve` runs out.
+    """
+
+
+def luby(i):
+    """
+    Return the `i`th term (counting from 1) of the Luby sequence
+    1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    """
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+# The positions of the bits set in each byte value
+BYTE_BITS = [
+    tuple(k for k in range(8) if byte >> k & 1) for byte in range(256)
+]
+
+
+def members(bits):
+    """
+    Return a list of the numbers of the bits set in the bitset `bits`.
+    """
+    # Clearing the lowest bit one at a time copies the whole number each
+    # time, which is quadratic in its size; a byte at a time is linear
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    return [
+        8 * i + k
+        for i, byte in enumerate(data) if byte
+        for k in BYTE_BITS[byte]
+    ]
+
+
 def main():
 
     # Check usage